@@ -17,10 +17,16 @@ Description: Mimics what a compiled __coconut__.py would do.
 
 from __future__ import print_function, absolute_import, unicode_literals, division
 
-from coconut.compiler import Compiler as __coconut_compiler__
+from coconut.runtime import import_sys_runtime as __coconut_import_sys_runtime__
 
 #-----------------------------------------------------------------------------------------------------------------------
 # HEADER:
 #-----------------------------------------------------------------------------------------------------------------------
 
-exec(__coconut_compiler__(target="sys").headers("code"))  # executes the __coconut__.py header for the current Python version
+try:
+    __coconut_runtime__ = __coconut_import_sys_runtime__()  # precompiled when Coconut is built
+except ImportError:  # not built, as when running from a source checkout
+    from coconut.compiler import Compiler as __coconut_compiler__
+    exec(__coconut_compiler__(target="sys").headers("code"))  # executes the __coconut__.py header for the current Python version
+else:
+    globals().update((name, value) for name, value in vars(__coconut_runtime__).items() if not name.startswith("__"))
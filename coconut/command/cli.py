@@ -166,6 +166,22 @@ arguments.add_argument(
     type=int,
     help="set maximum recursion depth in compiler (defaults to " + str(default_recursion_limit) + ")")
 
+arguments.add_argument(
+    "--parse-budget", "--parsebudget",
+    metavar="attempts",
+    type=int,
+    help="abort compiling any file whose parse takes more than this many grammar element attempts")
+
+arguments.add_argument(
+    "--hoist-helpers", "--hoisthelpers",
+    action="store_true",
+    help="bind the runtime helpers used by compiled code to module-level names to speed up looking them up")
+
+arguments.add_argument(
+    "--import-runtime", "--importruntime",
+    action="store_true",
+    help="import the runtime from the installed coconut package instead of putting it in or next to compiled files")
+
 arguments.add_argument(
     "--verbose",
     action="store_true",
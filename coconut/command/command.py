@@ -39,6 +39,7 @@ from coconut.constants import (
     documentation_url,
     icoconut_kernel_dirs,
     minimum_recursion_limit,
+    parallel_parse_lines,
 )
 from coconut.command.util import (
     openfile,
@@ -135,6 +136,9 @@ class Command(object):
             minify=args.minify,
             line_numbers=args.line_numbers,
             keep_lines=args.keep_lines,
+            parse_budget=args.parse_budget,
+            hoist_helpers=args.hoist_helpers,
+            import_runtime=args.import_runtime,
         )
 
         if args.source is not None:
@@ -284,7 +288,7 @@ class Command(object):
             destdir = os.path.dirname(destpath)
             if not os.path.exists(destdir):
                 os.makedirs(destdir)
-            if package is True:
+            if package is True and not self.comp.import_runtime:
                 self.create_package(destdir)
 
         foundhash = None if force else self.hashashof(destpath, code, package)
@@ -317,7 +321,11 @@ class Command(object):
                 elif self.show:
                     print(compiled)
 
-            self.submit_comp_job(codepath, callback, compile_method, code)
+            if self.executor is not None and code.count("\n") >= parallel_parse_lines:
+                with self.handling_exceptions():  # parse large files in chunks across the job pool
+                    callback(getattr(self.comp, compile_method)(code, chunk_map=self.map_comp_jobs))
+            else:
+                self.submit_comp_job(codepath, callback, compile_method, code)
 
     def submit_comp_job(self, path, callback, method, *args, **kwargs):
         """Submits a job on self.comp to be run in parallel."""
@@ -337,6 +345,10 @@ class Command(object):
                         callback(result)
             future.add_done_callback(callback_wrapper)
 
+    def map_comp_jobs(self, method, *iterables):
+        """Maps a method of self.comp over iterables in parallel, keeping the results in order."""
+        return self.executor.map(multiprocess_wrapper(self.comp, method), *iterables)
+
     def set_jobs(self, jobs):
         """Sets --jobs."""
         if jobs == "sys":
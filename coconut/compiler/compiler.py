@@ -30,9 +30,13 @@ from __future__ import print_function, absolute_import, unicode_literals, divisi
 from coconut.root import *  # NOQA
 
 import sys
+import re
+import ast
+from contextlib import contextmanager
 
 from pyparsing import (
     ParseBaseException,
+    ParserElement,
     col,
     line as getline,
     lineno,
@@ -41,6 +45,8 @@ from pyparsing import (
 )
 
 from coconut.constants import (
+    dynamic_names,
+    lazy_modules,
     specific_targets,
     targets,
     pseudo_targets,
@@ -52,11 +58,17 @@ from coconut.constants import (
     lnwrapper,
     unwrapper,
     holds,
+    downs,
+    ups,
     tabideal,
     tabworth,
     match_to_var,
     match_check_var,
-    match_err_var,
+    pattern_call_var,
+    pattern_marker_var,
+    sentinel_var,
+    hoisted_var,
+    wildcard,
     lazy_chain_var,
     import_as_var,
     yield_from_var,
@@ -66,6 +78,12 @@ from coconut.constants import (
     new_to_old_stdlib,
     default_recursion_limit,
     checksum,
+    reserved_prefix,
+    reserved_vars,
+    continuation_keywords,
+    pure_python_nodes,
+    parse_offenders,
+    parse_chunk_lines,
 )
 from coconut.exceptions import (
     CoconutException,
@@ -80,7 +98,7 @@ from coconut.exceptions import (
 from coconut.logging import logger, trace, complain
 from coconut.compiler.grammar import (
     Grammar,
-    lazy_list_handle,
+    chain_handle,
     get_infix_items,
     Matcher,
     match_handle,
@@ -96,12 +114,20 @@ from coconut.compiler.util import (
     attach,
     split_leading_indent,
     split_trailing_indent,
+    split_args,
+    get_ln_marker,
     match_in,
     transform,
+    parse_python,
+    iter_lines,
+    join_lines,
+    ParseTracker,
+    ParseBudgetExceeded,
 )
 from coconut.compiler.header import (
     minify,
     getheader,
+    name_regex,
 )
 
 # end: IMPORTS
@@ -112,6 +138,41 @@ from coconut.compiler.header import (
 if sys.getrecursionlimit() < default_recursion_limit:
     sys.setrecursionlimit(default_recursion_limit)
 
+continuation_regex = re.compile(r"(?:" + "|".join(continuation_keywords) + r")\b", re.U)
+impure_python_regex = re.compile(
+    r"\.\.|::|->|\$|`|\\|<>|\(\||\|\)|\|>|\|\*>|<\*?\|"  # Coconut operators and passthroughs
+    + r"|\b(?:" + "|".join(reserved_vars + ("exec",)) + r")\b"  # names the grammar treats specially
+    + r"|" + reserved_prefix
+    + r"|(?<!\w)\d[\w.]*_"  # numbers with underscores
+    + r"|(?<!\w)(?:[uUfF]|[rR][uUfF]|[uUfF][rR])" + strwrapper,  # u and f strings
+    re.U)
+docstring_regex = re.compile(r"\w*" + strwrapper, re.U)
+docstring_line_regex = re.compile(r"\w*" + strwrapper + r"\d+" + unwrapper + r"$", re.U)
+ref_regex = re.compile(r"(?<=[" + strwrapper + r"#\\])\d+(?=[" + unwrapper + lnwrapper + r"])", re.U)
+stmt_lambda_regex = re.compile(stmt_lambda_var + r"_(\d+)", re.U)
+lazy_chain_regex = re.compile(lazy_chain_var + r"_(\d+)", re.U)
+def_regex = re.compile(r"def (\w+)\(", re.U)
+param_regex = re.compile(r"(\w+)\s*(?:[:=]|$)", re.U)
+kwarg_regex = re.compile(r"(\w+)\s*=(?!=)", re.U)
+closure_regex = re.compile(r"\b(?:lambda|def|class)\b", re.U)
+comp_regex = re.compile(r"\bfor\b", re.U)
+scope_regex = re.compile(r"\b(?:global|nonlocal)\b", re.U)
+exit_regex = re.compile(r"(?:return|raise|continue)\b", re.U)
+assign_op_regex = re.compile(r"(?<![=!<>])(?:[-+*/%&|^@]|//|\*\*|<<|>>)?=(?!=)", re.U)
+subscript_regex = re.compile(r"(?<=[\w)\]])\s*\[[^\[\]]*\]", re.U)
+target_name_regex = re.compile(r"(?<![.\w])([^\W\d]\w*)(?!\s*[.(\w])", re.U)
+def_name_regex = re.compile(r"(?:(?:async|match)\s+)*(?:def|class|data)\s+(\w+)", re.U)
+pattern_arg_regex = re.compile(r"\b(?:addpattern|prepattern)\s*\(\s*(\w+)", re.U)
+helper_regex = re.compile(r"(?<![\w.])_coconut\.(?!(?:" + "|".join(lazy_modules) + r")\b)(\w+(?:\.\w+)*)", re.U)
+
+pattern_call_check = (
+    pattern_call_var + " = " + match_to_var + " and " + match_to_var + "[-1] is " + pattern_marker_var + "\n"
+    + "if " + pattern_call_var + ":\n" + openindent + match_to_var + " = " + match_to_var + "[:-1]\n" + closeindent
+)
+pattern_call_return_regex = re.compile(
+    r"if " + pattern_call_var + r"\b[^:\n]*:\n" + openindent + r"return " + pattern_marker_var + r"\n" + closeindent,
+    re.U)
+
 # end: SETUP
 #-----------------------------------------------------------------------------------------------------------------------
 # HANDLERS:
@@ -163,6 +224,96 @@ def gen_imports(path, impas):
             out.append("from " + imp_from + " import " + imp + " as " + impas)
     return out
 
+
+def split_stmts(code):
+    """Splits code into its statements, each with its indentation level."""
+    stmts = []
+    level = 0
+    for line in code.splitlines():
+        indent, line = split_leading_indent(line)
+        level += ind_change(indent)
+        line, indent = split_trailing_indent(line)
+        stmt = rem_comment(line).strip()
+        if stmt:
+            stmts.append((level, stmt))
+        level += ind_change(indent)
+    return stmts
+
+
+def get_bindings(stmt):
+    """Gets the names bound by stmt, the part of stmt that is read, and whether stmt is a plain assignment."""
+    if stmt.startswith("import ") or stmt.startswith("from "):
+        names = []
+        for imp in split_args(stmt.split("import ", 1)[1].strip("()")):
+            imp, _, impas = imp.partition(" as ")
+            names.append(impas.strip() or imp.split(".", 1)[0].strip())
+        return names, "", True
+    elif stmt.startswith("for "):
+        target, _, read = stmt[4:].partition(" in ")
+        return target_name_regex.findall(subscript_regex.sub("", target)), read, False
+    elif stmt.startswith("with ") or stmt.startswith("except"):
+        return re.findall(r"\bas\s+(\w+)", stmt, re.U), stmt, False
+    elif stmt.startswith("del "):
+        return target_name_regex.findall(subscript_regex.sub("", stmt[4:])), "", False
+    ops = []
+    level = 0
+    for i, c in enumerate(stmt):
+        if c in downs:
+            level += 1
+        elif c in ups:
+            level -= 1
+        elif not level:
+            op_match = assign_op_regex.match(stmt, i)
+            if op_match:
+                ops.append(op_match)
+    if not ops:
+        return [], stmt, False
+    targets = stmt[:ops[-1].start()]
+    while subscript_regex.search(targets):
+        targets = subscript_regex.sub("", targets)
+    plain = all(op_match.group() == "=" for op_match in ops)
+    return target_name_regex.findall(targets), stmt[ops[-1].end():] if plain else stmt, plain
+
+
+def rebound_names(code):
+    """Gets the names in code that are bound more than once or passed to addpattern or prepattern."""
+    names = set(pattern_arg_regex.findall(code))
+    bound = set()
+    for level, stmt in split_stmts(code):
+        def_match = def_name_regex.match(stmt)
+        if def_match:
+            stmt_names = [def_match.group(1)]
+        elif stmt.startswith("@"):
+            continue
+        else:
+            stmt_names = get_bindings(stmt)[0]
+        for name in stmt_names:
+            if name in bound:
+                names.add(name)
+            bound.add(name)
+    return names
+
+
+def stmts_exit(stmts):
+    """Determines whether running stmts always ends in a return, raise, or continue."""
+    if not stmts:
+        return False
+    heads = [i for i, (level, stmt) in enumerate(stmts) if level == stmts[0][0]]
+    if exit_regex.match(stmts[heads[-1]][1]):
+        return True
+    elif not re.match(r"else\s*:$", stmts[heads[-1]][1]):
+        return False
+    for i in reversed(range(len(heads))):  # walk back up the if/elif/else chain
+        head = stmts[heads[i]][1]
+        end = heads[i + 1] if i + 1 < len(heads) else len(stmts)
+        if not stmts_exit(stmts[heads[i] + 1:end]):
+            return False
+        elif head.startswith("if "):
+            return True
+        elif i + 1 < len(heads) and not head.startswith("elif "):
+            return False  # the else belongs to a for, while, or try
+    return False
+
 # end: HANDLERS
 #-----------------------------------------------------------------------------------------------------------------------
 # COMPILER:
@@ -176,10 +327,12 @@ class Compiler(Grammar):
         lambda self: self.str_proc,
         lambda self: self.passthrough_proc,
         lambda self: self.ind_proc,
+        lambda self: self.pure_python_proc,
     ]
     postprocs = [
         lambda self: self.stmt_lambda_proc,
         lambda self: self.reind_proc,
+        lambda self: self.hoist_proc,
         lambda self: self.repl_proc,
         lambda self: self.header_proc,
         lambda self: self.polish,
@@ -194,7 +347,7 @@ class Compiler(Grammar):
         """Creates a new compiler with the given parsing parameters."""
         self.setup(*args, **kwargs)
 
-    def setup(self, target=None, strict=False, minify=False, line_numbers=False, keep_lines=False):
+    def setup(self, target=None, strict=False, minify=False, line_numbers=False, keep_lines=False, parse_budget=None, hoist_helpers=False, import_runtime=False):
         """Initializes parsing parameters."""
         if target is None:
             target = ""
@@ -205,19 +358,21 @@ class Compiler(Grammar):
         if target not in targets:
             raise CoconutException('unsupported target Python version "' + target
                                    + '" (supported targets are "' + '", "'.join(specific_targets) + '", or leave blank for universal)')
+        if parse_budget is not None and parse_budget < 1:
+            raise CoconutException("--parse-budget must be at least 1")
         self.target, self.strict, self.minify, self.line_numbers, self.keep_lines = target, strict, minify, line_numbers, keep_lines
+        self.parse_budget, self.hoist_helpers, self.import_runtime = parse_budget, hoist_helpers, import_runtime
 
     def __reduce__(self):
         """Return pickling information."""
-        return (Compiler, (self.target, self.strict, self.minify, self.line_numbers, self.keep_lines))
+        return (Compiler, (self.target, self.strict, self.minify, self.line_numbers, self.keep_lines, self.parse_budget, self.hoist_helpers, self.import_runtime))
 
     def genhash(self, package, code):
         """Generates a hash from code."""
         return hex(checksum(
             hash_sep.join(
                 str(item) for item in
-                (VERSION_STR,)
-                + self.__reduce__()[1]
+                (VERSION_STR, self.target, self.strict, self.minify, self.line_numbers, self.keep_lines, self.hoist_helpers, self.import_runtime)  # parse_budget doesn't affect output
                 + (package, code)
             ).encode(default_encoding)
         ) & 0xffffffff)  # necessary for cross-compatibility
@@ -226,10 +381,13 @@ class Compiler(Grammar):
         """Resets references."""
         self.indchar = None
         self.refs = []
+        self.ref_indices = {}
         self.skips = set()
+        self.ln_offset = 0
         self.docstring = ""
         self.ichain_count = 0
         self.stmt_lambdas = []
+        self.rebound = None
         self.bind()
 
     def bind(self):
@@ -262,7 +420,7 @@ class Compiler(Grammar):
         self.star_assign_item <<= attach(self.star_assign_item_ref, self.star_assign_item_check, copy=True)
         self.classic_lambdef <<= attach(self.classic_lambdef_ref, self.lambdef_check, copy=True)
         self.async_funcdef <<= attach(self.async_funcdef_ref, self.async_stmt_check, copy=True)
-        self.async_match_funcdef <<= attach(self.async_match_funcdef_ref, self.async_stmt_check, copy=True)
+        self.async_match_funcdef <<= attach(attach(self.async_match_funcdef_ref, self.async_stmt_check, copy=True), self.async_match_funcdef_handle)
         self.async_stmt <<= attach(self.async_stmt_ref, self.async_stmt_check, copy=True)
         self.await_keyword <<= attach(self.await_keyword_ref, self.await_keyword_check, copy=True)
         self.star_expr <<= attach(self.star_expr_ref, self.star_expr_check, copy=True)
@@ -271,6 +429,7 @@ class Compiler(Grammar):
 
     def adjust(self, ln):
         """Adjusts a line number."""
+        ln += self.ln_offset
         adj_ln = 0
         i = 0
         while i < ln:
@@ -305,10 +464,10 @@ class Compiler(Grammar):
     def add_ref(self, ref):
         """Adds a reference and returns the identifier."""
         try:
-            index = self.refs.index(ref)
-        except ValueError:
+            index = self.ref_indices[ref]
+        except KeyError:
             self.refs.append(ref)
-            index = len(self.refs) - 1
+            index = self.ref_indices[ref] = len(self.refs) - 1
         return str(index)
 
     def get_ref(self, index):
@@ -382,19 +541,126 @@ class Compiler(Grammar):
         last = rem_comment(code.splitlines()[-1])
         return last.endswith(":") or last.endswith("\\") or paren_change(last) < 0
 
-    def parse(self, inputstring, parser, preargs, postargs):
-        """Uses the parser to parse the inputstring."""
-        self.reset()
+    def grammar_names(self):
+        """Maps the ids of named grammar elements to their names."""
+        names = {}
+        for name, item in vars(Grammar).items():
+            if isinstance(item, ParserElement):
+                names[id(item)] = name
+        return names
+
+    def parse_summary(self, tracker):
+        """Describes the grammar elements and source lines a parse spent the most attempts on."""
+        return (
+            str(tracker.attempts) + " grammar element attempts; worst elements: "
+            + ", ".join(name + " (" + str(attempts) + ")" for name, attempts in tracker.worst_elements(parse_offenders))
+            + "; worst lines: "
+            + ", ".join(str(self.adjust(ln)) + " (" + str(attempts) + ")" for ln, attempts in tracker.worst_lines(parse_offenders))
+        )
+
+    def run_parser(self, parser, inputstring):
+        """Runs the parser on preprocessed code, tracking it if a budget is set or in verbose mode."""
+        if self.parse_budget is None and not logger.verbose:
+            return parser.parseWithTabs().parseString(inputstring)
+        tracker = ParseTracker(self.grammar_names(), self.parse_budget)
+        try:
+            with tracker:
+                parsed = parser.parseWithTabs().parseString(inputstring)
+        except ParseBudgetExceeded:
+            raise CoconutException("parse budget of " + str(self.parse_budget) + " grammar element attempts exceeded",
+                                   extra=self.parse_summary(tracker) + " (try again with a larger --parse-budget or simplify the worst lines)")
+        logger.log("[parse] " + self.parse_summary(tracker))
+        return parsed
+
+    @contextmanager
+    def parsing(self):
+        """Converts errors raised while parsing into Coconut exceptions."""
         try:
-            out = self.post(parser.parseWithTabs().parseString(self.pre(inputstring, **preargs)), **postargs)
+            yield
         except ParseBaseException as err:
             err_line, err_index = self.reformat(err.line, err.col - 1)
             raise CoconutParseError(None, err_line, err_index, self.adjust(err.lineno))
         except RuntimeError as err:
             raise CoconutException(str(err),
                                    extra="try again with --recursion-limit greater than the current " + str(sys.getrecursionlimit()))
+
+    def parse(self, inputstring, parser, preargs, postargs, chunk_map=None):
+        """Uses the parser to parse the inputstring.
+
+        If chunk_map is given, large inputs are split into chunks of top-level statements, which are
+        parsed by calling chunk_map("parse_chunk", *argument_lists) as with map on this compiler's methods."""
+        self.reset()
+        with self.parsing():
+            pre_procd = self.pre(inputstring, **preargs)
+            self.rebound = rebound_names(pre_procd)
+            if chunk_map is None:
+                chunks = [pre_procd]
+            else:
+                chunks = self.split_chunks(pre_procd)
+            if len(chunks) > 1:
+                ln_offsets = [0]
+                for chunk in chunks[:-1]:
+                    ln_offsets.append(ln_offsets[-1] + chunk.count("\n"))
+                refs, skips = tuple(self.refs), self.skips.copy()  # chunk_map may send later chunks only after merge_chunks has added to these
+                parsed = [self.merge_chunks(chunk_map(
+                    "parse_chunk",
+                    chunks,
+                    [refs] * len(chunks),
+                    [skips] * len(chunks),
+                    [self.rebound] * len(chunks),
+                    ln_offsets,
+                    [i == 0 for i in range(len(chunks))],
+                ))]
+            else:
+                parsed = self.run_parser(parser, pre_procd)
+            out = self.post(parsed, **postargs)
         return out
 
+    def split_chunks(self, inputstring):
+        """Splits preprocessed code at top-level statements into chunks that parse to the parts of its output."""
+        lines = inputstring.split("\n")
+        chunks = []
+        start = 0
+        for i in self.top_level_starts(lines):
+            if i - start >= parse_chunk_lines:
+                body = lines[i].lstrip(closeindent)
+                chunks.append("\n".join(lines[start:i]) + "\n" + lines[i][:len(lines[i]) - len(body)])  # dedents close the previous chunk
+                lines[i] = body
+                start = i
+        chunks.append("\n".join(lines[start:]))
+        return chunks
+
+    def parse_chunk(self, chunk, refs, skips, rebound, ln_offset, first=False):
+        """Parses a chunk from split_chunks, returning its output and the state it added."""
+        self.reset()
+        self.refs, self.skips, self.rebound, self.ln_offset = list(refs), skips, rebound, ln_offset
+        self.ref_indices = dict((self.refs[i], i) for i in range(len(self.refs) - 1, -1, -1))
+        with self.parsing():
+            parsed = self.run_parser(self.file_parser if first else self.chunk_parser, chunk)
+        return parsed[0], self.refs[len(refs):], self.stmt_lambdas, self.ichain_count, self.docstring
+
+    def merge_chunks(self, results):
+        """Merges the results of parse_chunk in order, renumbering the references and names each chunk added."""
+        num_refs = len(self.refs)
+        out = []
+        for chunk_out, new_refs, stmt_lambdas, ichain_count, docstring in results:
+            ref_nums = {}
+            for i in range(len(new_refs)):
+                ref_nums[str(num_refs + i)] = self.add_ref(new_refs[i])
+            lambda_offset, ichain_offset = len(self.stmt_lambdas), self.ichain_count
+
+            def renumber(code):
+                """Renumbers the references and names in code from the chunk."""
+                code = ref_regex.sub(lambda match: ref_nums.get(match.group(), match.group()), code)
+                code = stmt_lambda_regex.sub(lambda match: self.stmt_lambda_name(int(match.group(1)) + lambda_offset), code)
+                return lazy_chain_regex.sub(lambda match: lazy_chain_var + "_" + str(int(match.group(1)) + ichain_offset), code)
+            out.append(renumber(chunk_out))
+            self.stmt_lambdas.extend(renumber(stmt_lambda) for stmt_lambda in stmt_lambdas)
+            self.ichain_count += ichain_count
+            if docstring:
+                self.docstring = docstring
+        return "".join(out)
+
 # end: COMPILER
 #-----------------------------------------------------------------------------------------------------------------------
 # PROCESSORS:
@@ -589,29 +855,34 @@ class Compiler(Grammar):
 
     def ind_proc(self, inputstring, **kwargs):
         """Processes indentation."""
-        lines = inputstring.splitlines()
-        new = []
+        return join_lines(self.ind_proc_lines(inputstring))
+
+    def ind_proc_lines(self, inputstring):
+        """Generates the lines processed by ind_proc."""
+        held = None  # the last new line, held back in case the next line continues it
+        num_new = 0
         levels = []
         count = 0
         current = None
         skips = self.skips.copy()
 
-        for ln in range(len(lines)):
-            line = lines[ln]
-            ln += 1
+        for ln, line in enumerate(iter_lines(inputstring), 1):
             line_rstrip = line.rstrip()
             if line != line_rstrip:
                 if self.strict:
                     raise self.make_err(CoconutStyleError, "found trailing whitespace", line, len(line), self.adjust(ln))
                 else:
                     line = line_rstrip
-            if new:
-                last = rem_comment(new[-1])
+            if held is not None:
+                last = rem_comment(held)
             else:
                 last = None
             if not line or line.lstrip().startswith("#"):
                 if count >= 0:
-                    new.append(line)
+                    if held is not None:
+                        yield held
+                    held = line
+                    num_new += 1
                 else:
                     skips = addskip(skips, self.adjust(ln))
             elif last is not None and last.endswith("\\"):
@@ -619,10 +890,10 @@ class Compiler(Grammar):
                     raise self.make_err(CoconutStyleError, "found backslash continuation", last, len(last), self.adjust(ln - 1))
                 else:
                     skips = addskip(skips, self.adjust(ln))
-                    new[-1] = last[:-1] + " " + line
+                    held = last[:-1] + " " + line
             elif count < 0:
                 skips = addskip(skips, self.adjust(ln))
-                new[-1] = last + " " + line
+                held = last + " " + line
             else:
                 check = self.leading(line)
                 if current is None:
@@ -641,19 +912,103 @@ class Compiler(Grammar):
                     current = levels.pop()
                 elif current != check:
                     raise self.make_err(CoconutSyntaxError, "illegal dedent to unused indentation level", line, 0, self.adjust(ln))
-                new.append(line)
+                if held is not None:
+                    yield held
+                held = line
+                num_new += 1
             count += paren_change(line)
             if count > 0:
-                raise self.make_err(CoconutSyntaxError, "unmatched close parentheses", new[-1], len(new[-1]), self.adjust(len(new)))
+                raise self.make_err(CoconutSyntaxError, "unmatched close parentheses", held, len(held), self.adjust(num_new))
 
         self.skips = skips
-        if new:
-            last = rem_comment(new[-1])
+        if held is not None:
+            last = rem_comment(held)
             if last.endswith("\\"):
-                raise self.make_err(CoconutSyntaxError, "illegal final backslash continuation", last, len(last), self.adjust(len(new)))
+                raise self.make_err(CoconutSyntaxError, "illegal final backslash continuation", last, len(last), self.adjust(num_new))
             if count != 0:
-                raise self.make_err(CoconutSyntaxError, "unclosed open parentheses", new[-1], len(new[-1]), self.adjust(len(new)))
-        new.append(closeindent * len(levels))
+                raise self.make_err(CoconutSyntaxError, "unclosed open parentheses", held, len(held), self.adjust(num_new))
+            yield held
+        yield closeindent * len(levels)
+
+    def top_level_starts(self, lines):
+        """Finds the indices of the preprocessed lines that begin top-level statements."""
+        starts = []
+        level = 0
+        last = ""
+        for i in range(len(lines) - 1):  # the final line only holds closing indentation
+            line = lines[i]
+            body = line.lstrip(closeindent)
+            level += ind_change(line)
+            if (level == 0
+                    and body and not body.lstrip().startswith("#")
+                    and not continuation_regex.match(body)
+                    and not last.startswith("@")):
+                starts.append(i)
+            if level == 0 and body.strip() and not body.lstrip().startswith("#"):
+                last = body
+        return starts
+
+    def pure_python_check(self, code):
+        """Determines whether a preprocessed block is pure Python that would compile to itself."""
+        if impure_python_regex.search(code) or docstring_regex.match(code) or (self.strict and ";" in code):
+            return False
+        tree = parse_python(self.reformat(code))
+        if tree is None:
+            return False
+        call_stars = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Call):
+                call_stars.update(id(arg) for arg in node.args)
+        for node in ast.walk(tree):
+            node_type = node.__class__.__name__
+            if node_type not in pure_python_nodes:
+                return False
+            elif node_type == "Starred" and id(node) not in call_stars:
+                return False
+            elif node_type == "Lambda" and self.strict:
+                return False
+            elif node_type in ("Set", "SetComp") and self.target_info() < (2, 7):
+                return False
+            elif node_type == "DictComp" and not self.target.startswith("3"):
+                return False
+            elif node_type == "Dict" and None in node.keys:
+                return False
+            elif node_type == "Raise" and (getattr(node, "cause", None) is not None or getattr(node, "inst", None) is not None):
+                return False
+            elif node_type == "ExceptHandler" and isinstance(node.name, ast.AST):
+                return False
+            elif node_type == "comprehension" and getattr(node, "is_async", False):
+                return False
+            elif node_type == "arguments" and getattr(node, "posonlyargs", None):
+                return False
+        return True
+
+    def pure_python_proc(self, inputstring, fast_path=False, **kwargs):
+        """Passes through top-level blocks of pure Python without running the grammar on them."""
+        if not fast_path or self.minify or self.line_numbers or self.keep_lines:
+            return inputstring
+        lines = inputstring.split("\n")
+        starts = self.top_level_starts(lines)
+        starts.append(len(lines) - 1)
+
+        new = lines[:starts[0]]
+        skips = self.skips.copy()
+        dedent_next = False
+        for start, stop in zip(starts, starts[1:] + [None]):
+            block = lines[start:stop]
+            if dedent_next:
+                block[0] = block[0].lstrip(closeindent)
+                dedent_next = False
+            if stop is not None:
+                code = "\n".join(self.reind_proc_lines([block[0].lstrip(closeindent)] + block[1:], closed=False))
+                if self.pure_python_check(code):
+                    for ln in range(start + 2, stop + 1):
+                        skips = addskip(skips, self.adjust(ln))
+                    dedent = block[0][:len(block[0]) - len(block[0].lstrip(closeindent))]
+                    block = [dedent + "\\\\" + self.add_ref(code) + unwrapper]  # same as a \\ passthrough
+                    dedent_next = True
+            new.extend(block)
+        self.skips = skips
         return "\n".join(new)
 
     def stmt_lambda_proc(self, inputstring, **kwargs):
@@ -670,10 +1025,13 @@ class Compiler(Grammar):
 
     def reind_proc(self, inputstring, **kwargs):
         """Adds back indentation."""
-        out = []
+        return join_lines(self.reind_proc_lines(iter_lines(inputstring)))
+
+    def reind_proc_lines(self, lines, closed=True):
+        """Generates the lines processed by reind_proc, checking that they close every indentation level they open if closed."""
         level = 0
 
-        for line in inputstring.splitlines():
+        for line in lines:
             line = line.strip()
             if "#" in line:
                 line, comment = line.split("#", 1)
@@ -691,11 +1049,10 @@ class Compiler(Grammar):
             line, indent = split_trailing_indent(line)
             level += ind_change(indent)
 
-            out.append(line + comment)
+            yield line + comment
 
-        if level != 0:
+        if closed and level != 0:
             complain(CoconutInternalException("non-zero final indentation level", level))
-        return "\n".join(out)
 
     def endline_comment(self, ln):
         """Gets an end line comment."""
@@ -723,32 +1080,34 @@ class Compiler(Grammar):
     def endline_repl(self, inputstring, add_to_line=True, careful=True, **kwargs):
         """Adds in end line comments."""
         if self.line_numbers or self.keep_lines:
-            out = []
-            ln = 1
-            fix = False
-            for line in inputstring.splitlines():
-                try:
-                    if line.endswith(lnwrapper):
-                        line, index = line[:-1].rsplit("#", 1)
-                        ln = self.get_ref(index)
-                        if not isinstance(ln, int):
-                            raise CoconutInternalException("invalid reference for a line number", ln)
-                        line = line.rstrip()
-                        fix = True
-                    elif fix:
-                        ln += 1
-                        fix = False
-                    if add_to_line and line and not line.lstrip().startswith("#"):
-                        line += self.endline_comment(ln)
-                except CoconutInternalException as err:
-                    if careful:
-                        complain(err)
-                    fix = False
-                out.append(line)
-            return "\n".join(out)
+            return join_lines(self.endline_repl_lines(inputstring, add_to_line, careful))
         else:
             return inputstring
 
+    def endline_repl_lines(self, inputstring, add_to_line=True, careful=True):
+        """Generates the lines processed by endline_repl."""
+        ln = 1
+        fix = False
+        for line in iter_lines(inputstring):
+            try:
+                if line.endswith(lnwrapper):
+                    line, index = line[:-1].rsplit("#", 1)
+                    ln = self.get_ref(index)
+                    if not isinstance(ln, int):
+                        raise CoconutInternalException("invalid reference for a line number", ln)
+                    line = line.rstrip()
+                    fix = True
+                elif fix:
+                    ln += 1
+                    fix = False
+                if add_to_line and line and not line.lstrip().startswith("#"):
+                    line += self.endline_comment(ln)
+            except CoconutInternalException as err:
+                if careful:
+                    complain(err)
+                fix = False
+            yield line
+
     def passthrough_repl(self, inputstring, careful=True, **kwargs):
         """Adds back passthroughs."""
         out = []
@@ -843,21 +1202,51 @@ class Compiler(Grammar):
 
         return "".join(out)
 
+    def hoist_proc(self, inputstring, header="file", **kwargs):
+        """Binds the runtime helpers used in inputstring to module-level names when hoist_helpers is enabled."""
+        if not self.hoist_helpers or header == "none":
+            return inputstring
+        helpers = set()
+
+        def hoist_repl(match):
+            """Replaces a helper with its hoisted name."""
+            helpers.add(match.group(1))
+            return hoisted_var + "_" + match.group(1).replace(".", "_")
+        out = helper_regex.sub(hoist_repl, inputstring)
+        return "".join(
+            hoisted_var + "_" + helper.replace(".", "_") + " = _coconut." + helper + "\n"
+            for helper in sorted(helpers)
+        ) + out
+
     def repl_proc(self, inputstring, **kwargs):
         """Processes using replprocs."""
         return self.apply_procs(self.replprocs, kwargs, inputstring)
 
-    def header_proc(self, inputstring, header="file", initial="initial", usehash=None, **kwargs):
-        """Adds the header."""
+    def header_proc(self, inputstring, header="file", initial="initial", usehash=None, tree_shake=False, **kwargs):
+        """Adds the header, only including the definitions inputstring needs if tree_shake."""
         pre_header = getheader(initial, self.target, usehash)
-        main_header = getheader(header, self.target)
+        if self.import_runtime and (header == "file" or header == "module"):
+            header, tree_shake = "runtime", True
+        used_names = None
+        if tree_shake:
+            used_names = set(name_regex.findall(inputstring))
+            if not used_names.isdisjoint(dynamic_names):
+                used_names = None
+        main_header = getheader(header, self.target, used_names=used_names)
         if self.minify:
             main_header = minify(main_header)
         return pre_header + self.docstring + main_header + inputstring
 
     def polish(self, inputstring, final_endline=True, **kwargs):
         """Does final polishing touches."""
-        return inputstring.rstrip() + ("\n" if final_endline else "")
+        stop = len(inputstring)
+        while stop and inputstring[stop - 1].isspace():  # rstrip without copying the whole string
+            stop -= 1
+        ending = "\n" if final_endline else ""
+        if inputstring[stop:] == ending:
+            return inputstring
+        else:
+            return inputstring[:stop] + ending
 
 # end: PROCESSORS
 #-----------------------------------------------------------------------------------------------------------------------
@@ -940,9 +1329,9 @@ class Compiler(Grammar):
             elif op == "..=":
                 out += name + " = (lambda f, g: lambda *args, **kwargs: f(g(*args, **kwargs)))(" + name + ", (" + item + "))"
             elif op == "::=":
-                ichain_var = lazy_chain_var + "_" + str(self.ichain_count)  # necessary to prevent a segfault caused by self-reference
+                ichain_var = lazy_chain_var + "_" + str(self.ichain_count)  # necessary to chain onto the old value instead of onto itself
                 out += ichain_var + " = " + name + "\n"
-                out += name + " = _coconut.itertools.chain.from_iterable(" + lazy_list_handle([ichain_var, "(" + item + ")"]) + ")"
+                out += name + " = " + chain_handle([ichain_var, "(" + item + ")"])
                 self.ichain_count += 1
             else:
                 out += name + " " + op + " " + item
@@ -1053,17 +1442,24 @@ class Compiler(Grammar):
             key, val, comp = tokens
             return "dict(((" + key + "), (" + val + ")) " + comp + ")"
 
-    def pattern_error(self, original, loc):
-        """Constructs a pattern-matching error message."""
+    def pattern_error(self, original, loc, params=None):
+        """Constructs a pattern-matching error message.
+        If params is a list of the leading parameters of a pattern-matching function, the pattern marker
+        is returned instead when a pattern-matching function dispatching to this one asks for it."""
         base_line = clean(self.reformat(getline(loc, original)))
         line_wrap = self.wrap_str_of(base_line)
-        repr_wrap = self.wrap_str_of(ascii(base_line))
-        return ("if not " + match_check_var + ":\n" + openindent
-                + match_err_var + ' = _coconut_MatchError("pattern-matching failed for " '
-                + repr_wrap + ' " in " + _coconut.repr(_coconut.repr(' + match_to_var + ")))\n"
-                + match_err_var + ".pattern = " + line_wrap + "\n"
-                + match_err_var + ".value = " + match_to_var
-                + "\nraise " + match_err_var + "\n" + closeindent)
+        out = "if not " + match_check_var + ":\n" + openindent
+        if params is None:
+            value = match_to_var
+        else:
+            out += ("if " + " or ".join([pattern_call_var] + [param + " is " + pattern_marker_var for param in params]) + ":\n"
+                    + openindent + "return " + pattern_marker_var + "\n" + closeindent)
+            if params:
+                value = ("_coconut.tuple(_coconut_arg for _coconut_arg in (" + ", ".join(params) + ",) if _coconut_arg is not "
+                         + sentinel_var + ") + " + match_to_var)
+            else:
+                value = match_to_var
+        return out + "raise _coconut_MatchError(" + line_wrap + ", " + value + ")\n" + closeindent
 
     def destructuring_stmt_handle(self, original, loc, tokens):
         """Processes match assign blocks."""
@@ -1084,14 +1480,34 @@ class Compiler(Grammar):
             func, matches, cond = tokens
         else:
             raise CoconutInternalException("invalid match function definition tokens", tokens)
-        matching = Matcher()
-        matching.match_sequence(("(", matches), match_to_var, typecheck=False)
+        params = []
+        for match in matches:
+            if "var" not in match.keys() or match[0] == wildcard or match[0] in params:
+                break
+            params.append(match[0])
+        matches = matches[len(params):]
+        matching = Matcher(names=((param, param) for param in params))
+        for param in params:
+            matching.checks.append(param + " is not " + sentinel_var)
+        if params:  # only the first missing parameter can get the pattern marker, so only the last needs checking for it
+            matching.checks.append(params[-1] + " is not " + pattern_marker_var)
+        if matches:
+            matching.match_sequence(("(", matches), match_to_var, typecheck=False)
+        else:
+            matching.checks.append("not " + match_to_var)
         if cond is not None:
             matching.add_guard(cond)
-        out = "def " + func + "(*" + match_to_var + "):\n" + openindent
+        out = "def " + func + "(" + "".join(param + "=" + sentinel_var + ", " for param in params) + "*" + match_to_var + "):\n" + openindent
+        fast = params and not matches and cond is None  # the patterns are just the parameters, so a correct call needs no matching
+        if fast:
+            out += ("if " + " or ".join([match_to_var] + [param + " is " + sentinel_var for param in params] + [params[-1] + " is " + pattern_marker_var])
+                    + ":\n" + openindent)
         out += match_check_var + " = False\n"
+        out += pattern_call_check
         out += matching.out()
-        out += self.pattern_error(original, loc) + closeindent
+        out += self.pattern_error(original, loc, params) + closeindent
+        if fast:
+            out += closeindent
         return out
 
     def op_match_funcdef_handle(self, original, loc, tokens):
@@ -1175,41 +1591,217 @@ class Compiler(Grammar):
         )
         return name
 
-    def normal_funcdef_stmt_handle(self, tokens):
-        """Determines if tail call optimization can be done and if so does it."""
+    def strip_pattern_call(self, func):
+        """Removes the pattern marker handling from a match function that can't return it."""
+        return pattern_call_return_regex.sub("", func.replace(pattern_call_check, ""))
+
+    def async_match_funcdef_handle(self, tokens):
+        """Processes async match defs."""
+        if len(tokens) != 1:
+            raise CoconutInternalException("invalid async match function definition tokens", tokens)
+        else:
+            return self.strip_pattern_call(tokens[0])
+
+    def tre_params(self, original, location, func):
+        """Gets the name and parameters of func if its self-recursive tail calls can be turned into a loop."""
+        if original.count(openindent, 0, location) != original.count(closeindent, 0, location):
+            return None  # not at top level, so the name might not refer to the function
+        end = original.rfind("\n", 0, location)
+        while end > 0:
+            start = original.rfind("\n", 0, end) + 1
+            prev = split_leading_indent(rem_comment(original[start:end]))[1]
+            if prev.startswith("@"):
+                return None  # decorated, so the name might not refer to the function
+            elif prev.strip():
+                break
+            end = start - 1
+
+        header, _, body = func.partition("\n")
+        def_match = def_regex.match(header)
+        if not def_match:
+            return None
+        func_name = def_match.group(1)
+        params_end = def_match.end()
+        level = 1
+        while level:
+            if params_end >= len(header):
+                return None
+            elif header[params_end] in downs:
+                level += 1
+            elif header[params_end] in ups:
+                level -= 1
+            params_end += 1
+        params = []
+        for param in split_args(header[def_match.end():params_end - 1]):
+            param_match = param_regex.match(param)
+            if not param_match:
+                return None  # star, keyword-only, or tuple parameters
+            params.append(param_match.group(1))
+        if func_name in params:
+            return None  # the name refers to the parameter instead
+        if func_name in self.rebound:
+            return None  # the name might later refer to something else, e.g. through addpattern
+
+        if closure_regex.search(body):
+            return None  # closures could capture the parameters we rebind
+        elif scope_regex.search(body):
+            return None  # global and nonlocal names can't be reset between iterations
+        for line in body.splitlines():
+            stmt = split_leading_indent(line)[1]
+            if len(comp_regex.findall(stmt)) > stmt.startswith("for "):
+                return None  # comprehensions could capture the parameters we rebind
+        if re.search(r"(?<![.\w])" + re.escape(func_name) + r"(?![\w(])", body, re.U):
+            return None  # the name is used other than by being called
+        return func_name, params
+
+    def tre_rebind(self, base, func_name, params):
+        """Turns a self-recursive tail call into a rebinding of the function's parameters."""
+        for tokens, start, stop in self.tre_return.scanString(base):
+            if len(tokens) != 2:
+                raise CoconutInternalException("invalid tail recursive return statement tokens", tokens)
+            prefix = base[:start]
+            if tokens[0] != func_name or split_leading_indent(prefix)[1]:
+                return None
+            names = []
+            values = []
+            positional = True
+            for arg in split_args(tokens[1].strip()[1:-1]):
+                kwarg_match = kwarg_regex.match(arg)
+                if kwarg_match:
+                    positional = False
+                    name, value = kwarg_match.group(1), arg[kwarg_match.end():].strip()
+                elif arg.startswith("*") or not positional or len(names) >= len(params):
+                    return None
+                else:
+                    name, value = params[len(names)], arg
+                if name in names or name not in params:
+                    return None
+                names.append(name)
+                values.append(value)
+            if len(names) != len(params):
+                return None  # leaving out parameters would require re-evaluating defaults
+            elif names:
+                return prefix + ", ".join(names) + " = " + ", ".join(values) + "\ncontinue"
+            else:
+                return prefix + "continue"
+        return None
+
+    def tre_loop(self, lines, params):
+        """Wraps the body of the function in lines in a loop for its rebound tail calls to continue."""
+        def_line, first = lines[0], 1
+        if not lines[first].startswith(openindent):
+            return None
+        elif docstring_line_regex.match(split_comment(lines[first][1:].rstrip())[0]):
+            first += 1
+        if first >= len(lines):
+            return None
+        body = split_stmts("".join(lines[1:]))[first - 1:]
+
+        names = []  # non-parameter locals, which must not carry over from one iteration to the next
+        assigned = []  # locals assigned before they could be read on every path
+        for i, (level, stmt) in enumerate(body):
+            bound, read, plain = get_bindings(stmt)
+            for name in bound:
+                if name not in params and name not in names:
+                    names.append(name)
+                    if level == 1 and plain and not any(
+                        re.search(r"(?<![.\w])" + name + r"(?!\w)", other, re.U)
+                        for other in [read] + [prev for _, prev in body[:i]]
+                    ):
+                        assigned.append(name)
+        reset = [name for name in names if name not in assigned]
+
+        ln_marker = get_ln_marker(lines[first])
+        loop = ["while True:" + ln_marker + "\n"]
+        if reset:
+            loop.append(openindent + " = ".join(reset) + " = None" + ln_marker + "\n")
+            loop.append("del " + ", ".join(reset) + ln_marker + "\n")
+        if first == 1:
+            loop[0] = openindent + loop[0]
+            loop.append(lines[1][1:] if reset else openindent + lines[1][1:])
+        else:
+            loop.append(lines[first] if reset else openindent + lines[first])
+        stmts, trail = split_trailing_indent("".join([def_line] + lines[1:first] + loop + lines[first + 1:]))
+        last_line = stmts.rsplit("\n", 1)[-1]
+
+        last_level = ind_change(stmts) - 1  # level within the loop of the last statement
+        end_level = last_level + ind_change(trail)
+        if end_level > 0 or openindent in trail:
+            return None
+        if stmts_exit(body):
+            return stmts + trail + closeindent
+        else:  # fall out of the loop when the body does
+            return (
+                stmts + "\n" + closeindent * (last_level - 1) + "return" + get_ln_marker(last_line)
+                + trail.replace(closeindent, "") + closeindent * (2 - end_level)
+            )
+
+    def normal_funcdef_stmt_handle(self, original, location, tokens):
+        """Determines if tail recursion elimination or tail call optimization can be done and if so does them."""
         if len(tokens) != 1:
             raise CoconutInternalException("invalid function definition tokens", tokens)
         else:
-            lines = []  # transformed
-            tco = False  # whether tco was done
-            level = 0  # indentation level
-            disabled_until_level = None  # whether inside of a def/try/with
-
-            for i, line in enumerate(tokens[0].splitlines(True)):
-                body, indent = split_trailing_indent(line)
-                level += ind_change(body)
-                if disabled_until_level is not None:
-                    if level <= disabled_until_level:
-                        disabled_until_level = None
-                if disabled_until_level is None:
-                    if match_in(Keyword("yield"), body):
-                        # we can't tco generators
-                        return tokens[0]
-                    elif i and match_in(Keyword("def") | Keyword("try") | Keyword("with"), body):
-                        disabled_until_level = level
+            tre_info = self.tre_params(original, location, tokens[0])
+            if tre_info is not None:
+                out = self.optimize_tail_calls(tokens[0], tre_info)
+                if out is not None:
+                    return out
+            return self.optimize_tail_calls(tokens[0])
+
+    def optimize_tail_calls(self, func, tre_info=None):
+        """Does tail recursion elimination if given tre_info and tail call optimization on func.
+        Returns None if tail recursion elimination was done but the loop for it couldn't be added."""
+        lines = []  # transformed
+        tco = False  # whether tco was done
+        tre = False  # whether tail recursion elimination was done
+        level = 0  # indentation level
+        disabled_until_level = None  # whether inside of a def/try/with
+        loop_until_level = None  # whether inside of a for/while
+
+        for i, line in enumerate(func.splitlines(True)):
+            body, indent = split_trailing_indent(line)
+            level += ind_change(body)
+            if disabled_until_level is not None:
+                if level <= disabled_until_level:
+                    disabled_until_level = None
+            if loop_until_level is not None:
+                if level <= loop_until_level:
+                    loop_until_level = None
+            if disabled_until_level is None:
+                if match_in(Keyword("yield"), body):
+                    # we can't tco generators, and they can't return the pattern marker
+                    return self.strip_pattern_call(func)
+                elif i and match_in(Keyword("def") | Keyword("try") | Keyword("with"), body):
+                    disabled_until_level = level
+                else:
+                    if loop_until_level is None and match_in(Keyword("for") | Keyword("while"), body):
+                        loop_until_level = level
+                    base, comment = split_comment(body)
+                    tre_base = None
+                    if tre_info is not None and loop_until_level is None:
+                        tre_base = self.tre_rebind(base, *tre_info)
+                    if tre_base is not None:
+                        rebind, sep, cont = tre_base.partition("\n")
+                        line = rebind + comment + sep + cont + (get_ln_marker(comment) if sep else "") + indent
+                        tre = True
                     else:
-                        base, comment = split_comment(body)
                         tco_base = transform(self.tco_return, base)
                         if tco_base is not None:
                             line = tco_base + comment + indent
                             tco = True
-                lines.append(line)
-                level += ind_change(indent)
+            lines.append(line)
+            level += ind_change(indent)
 
-            if tco:
-                return "@_coconut_tco\n" + "".join(lines)
-            else:
-                return tokens[0]
+        if tre:
+            out = self.tre_loop(lines, tre_info[1])
+            if out is None:
+                return None
+        else:
+            out = "".join(lines)
+        if tco:
+            return "@_coconut_tco\n" + out
+        else:
+            return out
 
 # end: COMPILER HANDLERS
 #-----------------------------------------------------------------------------------------------------------------------
@@ -1296,29 +1888,29 @@ class Compiler(Grammar):
         """Parses line code."""
         return self.parse(inputstring, self.single_parser, {}, {"header": "none", "initial": "none"})
 
-    def parse_file(self, inputstring, addhash=True):
+    def parse_file(self, inputstring, addhash=True, chunk_map=None):
         """Parses file code."""
         if addhash:
             usehash = self.genhash(False, inputstring)
         else:
             usehash = None
-        return self.parse(inputstring, self.file_parser, {"nl_at_eof_check": True}, {"header": "file", "usehash": usehash})
+        return self.parse(inputstring, self.file_parser, {"nl_at_eof_check": True, "fast_path": True}, {"header": "file", "usehash": usehash, "tree_shake": True}, chunk_map)
 
     def parse_exec(self, inputstring):
         """Parses exec code."""
-        return self.parse(inputstring, self.file_parser, {}, {"header": "file", "initial": "none"})
+        return self.parse(inputstring, self.file_parser, {"fast_path": True}, {"header": "file", "initial": "none"})
 
-    def parse_module(self, inputstring, addhash=True):
+    def parse_module(self, inputstring, addhash=True, chunk_map=None):
         """Parses module code."""
         if addhash:
             usehash = self.genhash(True, inputstring)
         else:
             usehash = None
-        return self.parse(inputstring, self.file_parser, {"nl_at_eof_check": True}, {"header": "module", "usehash": usehash})
+        return self.parse(inputstring, self.file_parser, {"nl_at_eof_check": True, "fast_path": True}, {"header": "module", "usehash": usehash}, chunk_map)
 
     def parse_block(self, inputstring):
         """Parses block code."""
-        return self.parse(inputstring, self.file_parser, {}, {"header": "none", "initial": "none"})
+        return self.parse(inputstring, self.file_parser, {"fast_path": True}, {"header": "none", "initial": "none"})
 
     def parse_eval(self, inputstring):
         """Parses eval code."""
@@ -66,7 +66,6 @@ from coconut.constants import (
     match_to_var,
     match_check_var,
     match_iter_var,
-    lazy_item_var,
     wildcard,
 )
 from coconut.compiler.util import (
@@ -111,13 +110,17 @@ def attr_handle(tokens):
         raise CoconutInternalException("invalid attrgetter literal tokens", tokens)
 
 
-def lazy_list_handle(tokens):
-    """Processes lazy lists."""
+def thunks_handle(tokens):
+    """Processes the items of lazy lists and chains into a tuple of thunks."""
     if len(tokens) == 0:
-        return "_coconut.iter(())"
+        return "()"
     else:
-        return ("(" + lazy_item_var + "() for " + lazy_item_var + " in ("
-                + "lambda: " + ", lambda: ".join(tokens) + ("," if len(tokens) == 1 else "") + "))")
+        return "(lambda: " + ", lambda: ".join(tokens) + ("," if len(tokens) == 1 else "") + ")"
+
+
+def lazy_list_handle(tokens):
+    """Processes lazy lists."""
+    return "_coconut_lazy_list(" + thunks_handle(tokens) + ")"
 
 
 def chain_handle(tokens):
@@ -125,7 +128,7 @@ def chain_handle(tokens):
     if len(tokens) == 1:
         return tokens[0]
     else:
-        return "_coconut.itertools.chain.from_iterable(" + lazy_list_handle(tokens) + ")"
+        return "_coconut_chain(" + thunks_handle(tokens) + ")"
 
 
 def infix_error(tokens):
@@ -283,6 +286,12 @@ class Matcher(object):
         "or": lambda self: self.match_or,
         "star": lambda self: self.match_star,
     }
+    fast_types = {
+        "Sequence": "_coconut_sequence_types",
+        "Mapping": "_coconut_mapping_types",
+        "Set": "_coconut_set_types",
+        "Iterable": "_coconut_iterable_types",
+    }
     __slots__ = (
         "position",
         "iter_index",
@@ -382,13 +391,18 @@ class Matcher(object):
         self.increment(True)
         self.add_check(cond)
 
+    def type_check(self, item, abc_name):
+        """Generates a check that item is an instance of the named abc, which first tries the common built-in types."""
+        return ("_coconut.isinstance(" + item + ", " + self.fast_types[abc_name] + ") or "
+                + "_coconut.isinstance(" + item + ", _coconut.abc." + abc_name + ")")
+
     def match_dict(self, original, item):
         """Matches a dictionary."""
         if len(original) == 1:
             match = original[0]
         else:
             raise CoconutInternalException("invalid dict match tokens", original)
-        self.checks.append("_coconut.isinstance(" + item + ", _coconut.abc.Mapping)")
+        self.checks.append(self.type_check(item, "Mapping"))
         self.checks.append("_coconut.len(" + item + ") == " + str(len(match)))
         for x in range(len(match)):
             k, v = match[x]
@@ -403,7 +417,7 @@ class Matcher(object):
         else:
             series_type, match, tail = original
         if typecheck:
-            self.checks.append("_coconut.isinstance(" + item + ", _coconut.abc.Sequence)")
+            self.checks.append(self.type_check(item, "Sequence"))
         if tail is None:
             self.checks.append("_coconut.len(" + item + ") == " + str(len(match)))
         else:
@@ -434,10 +448,10 @@ class Matcher(object):
             _, match = original
         else:
             _, match, tail = original
-        self.checks.append("_coconut.isinstance(" + item + ", _coconut.abc.Iterable)")
+        self.checks.append(self.type_check(item, "Iterable"))
         itervar = self.get_iter_var()
-        if tail is None:
-            self.defs.append(itervar + " = _coconut.tuple(" + item + ")")
+        if tail is None:  # one extra item is enough to know the length doesn't match
+            self.defs.append(itervar + " = _coconut.tuple(_coconut.itertools.islice(" + item + ", " + str(len(match) + 1) + "))")
         else:
             self.defs.append(tail + " = _coconut.iter(" + item + ")")
             self.defs.append(itervar + " = _coconut.tuple(_coconut_igetitem(" + tail + ", _coconut.slice(None, " + str(len(match)) + ")))")
@@ -458,18 +472,21 @@ class Matcher(object):
                 head_match, middle = original
         else:
             head_match, middle, last_match = original
-        self.checks.append("_coconut.isinstance(" + item + ", _coconut.abc.Iterable)")
+        self.checks.append(self.type_check(item, "Iterable"))
         if head_match is None and last_match is None:
-            self.defs.append(middle + " = _coconut.list(" + item + ")")
+            if middle != wildcard:
+                self.defs.append(middle + " = _coconut.list(" + item + ")")
         else:
             itervar = self.get_iter_var()
-            self.defs.append(itervar + " = _coconut.list(" + item + ")")
+            self.defs.append(itervar + " = " + item + " if " + self.type_check(item, "Sequence") + " else _coconut.list(" + item + ")")
             with self.incremented():
                 req_length = (len(head_match) if head_match is not None else 0) + (len(last_match) if last_match is not None else 0)
                 self.checks.append("_coconut.len(" + itervar + ") >= " + str(req_length))
-                head_splice = str(len(head_match)) if head_match is not None else ""
-                last_splice = "-" + str(len(last_match)) if last_match is not None else ""
-                self.defs.append(middle + " = " + itervar + "[" + head_splice + ":" + last_splice + "]")
+                if middle != wildcard:
+                    head_start = str(len(head_match)) if head_match is not None else "0"
+                    last_stop = "_coconut.len(" + itervar + ") - " + str(len(last_match)) if last_match is not None else "None"
+                    self.defs.append(middle + " = _coconut.list(" + itervar + "[" + head_start + ":" + last_stop + "] if _coconut.isinstance(" + itervar
+                                     + ", _coconut_sequence_types) else _coconut.itertools.islice(" + itervar + ", " + head_start + ", " + last_stop + "))")
                 if head_match is not None:
                     for x in range(len(head_match)):
                         self.match(head_match[x], itervar + "[" + str(x) + "]")
@@ -480,7 +497,7 @@ class Matcher(object):
     def match_rsequence(self, original, item):
         """Matches a reverse sequence."""
         front, series_type, match = original
-        self.checks.append("_coconut.isinstance(" + item + ", _coconut.abc.Sequence)")
+        self.checks.append(self.type_check(item, "Sequence"))
         self.checks.append("_coconut.len(" + item + ") >= " + str(len(match)))
         if len(match):
             splice = "[:" + str(-len(match)) + "]"
@@ -498,7 +515,7 @@ class Matcher(object):
     def match_msequence(self, original, item):
         """Matches a middle sequence."""
         series_type, head_match, middle, _, last_match = original
-        self.checks.append("_coconut.isinstance(" + item + ", _coconut.abc.Sequence)")
+        self.checks.append(self.type_check(item, "Sequence"))
         self.checks.append("_coconut.len(" + item + ") >= " + str(len(head_match) + len(last_match)))
         if len(head_match) and len(last_match):
             splice = "[" + str(len(head_match)) + ":" + str(-len(last_match)) + "]"
@@ -543,7 +560,7 @@ class Matcher(object):
             match = original[0]
         else:
             raise CoconutInternalException("invalid set match tokens", original)
-        self.checks.append("_coconut.isinstance(" + item + ", _coconut.abc.Set)")
+        self.checks.append(self.type_check(item, "Set"))
         self.checks.append("_coconut.len(" + item + ") == " + str(len(match)))
         for const in match:
             self.checks.append(const + " in " + item)
@@ -599,6 +616,16 @@ class Matcher(object):
                 return get_handler(self)(original, item)
         raise CoconutInternalException("invalid inner match tokens", original)
 
+    def steps(self):
+        """Flattens the checks and defs into a list of ("check", code) and ("def", code) steps."""
+        if self.others:
+            raise CoconutInternalException("cannot flatten matcher with alternatives", self.others)
+        steps = []
+        for checks, defs in self.checkdefs:
+            steps.extend(("check", check) for check in checks)
+            steps.extend(("def", def_item) for def_item in defs)
+        return steps
+
     def out(self):
         out = ""
         closes = 0
@@ -638,20 +665,66 @@ def match_handle(o, l, tokens, top=True):
     return out
 
 
-def case_to_match(tokens, item):
-    """Converts case tokens to match tokens."""
+def case_arm(tokens):
+    """Converts case tokens into a list of decision tree steps ending in a leaf."""
     if len(tokens) == 2:
         matches, stmts = tokens
-        return matches, item, stmts
+        cond = None
     elif len(tokens) == 3:
         matches, cond, stmts = tokens
-        return matches, item, cond, stmts
     else:
         raise CoconutInternalException("invalid case match tokens", tokens)
+    matching = Matcher()
+    matching.match(matches, match_to_var)
+    if matching.others:
+        if cond:
+            matching.add_guard(cond)
+        return [("leaf", matching.out() + "if " + match_check_var + ":\n" + openindent + "".join(stmts) + closeindent)]
+    else:
+        guard = [("check", cond)] if cond else []
+        return matching.steps() + guard + [("leaf", match_check_var + " = True\n" + "".join(stmts))]
+
+
+def add_arm(tree, steps):
+    """Adds the steps of a case arm to a decision tree, a list of [kind, code, subtree] nodes.
+    Steps are only shared with the last node at each level, so arms are still tried in order."""
+    for kind, code in steps:
+        if kind != "leaf" and tree and tree[-1][0] == kind and tree[-1][1] == code:
+            tree = tree[-1][2]
+        else:
+            tree.append([kind, code, []])
+            tree = tree[-1][2]
+
+
+def tree_out(tree):
+    """Generates code for a decision tree, where each node after the first only runs if nothing has matched yet."""
+    out = ""
+    for i, node in enumerate(tree):
+        checks = [] if i == 0 else ["not " + match_check_var]
+        kind, code, subtree = node
+        while kind == "check":
+            checks.append(code)
+            if len(subtree) == 1 and subtree[0][0] == "check":
+                kind, code, subtree = subtree[0]
+            else:
+                break
+        if kind == "check":
+            body = tree_out(subtree)
+        elif kind == "def":
+            body = code + "\n" + tree_out(subtree)
+        elif kind == "leaf":
+            body = code
+        else:
+            raise CoconutInternalException("invalid decision tree node kind", kind)
+        if checks:
+            out += "if (" + (") and (").join(checks) + "):\n" + openindent + body + closeindent
+        else:
+            out += body
+    return out
 
 
 def case_handle(o, l, tokens):
-    """Processes case blocks."""
+    """Processes case blocks by compiling all the arms into one decision tree that tests shared conditions once."""
     if len(tokens) == 2:
         item, cases = tokens
         default = None
@@ -659,10 +732,10 @@ def case_handle(o, l, tokens):
         item, cases, default = tokens
     else:
         raise CoconutInternalException("invalid top-level case tokens", tokens)
-    out = match_handle(o, l, case_to_match(cases[0], item))
-    for case in cases[1:]:
-        out += ("if not " + match_check_var + ":\n" + openindent
-                + match_handle(o, l, case_to_match(case, item), top=False) + closeindent)
+    tree = []
+    for case in cases:
+        add_arm(tree, case_arm(case))
+    out = match_check_var + " = False\n" + match_to_var + " = " + item + "\n" + tree_out(tree)
     if default is not None:
         out += "if not " + match_check_var + default
     return out
@@ -759,9 +832,9 @@ def tco_return_handle(tokens):
     if len(tokens) != 2:
         raise CoconutInternalException("invalid tail-call-optimizable return statement tokens", tokens)
     elif tokens[1].startswith("()"):
-        return "raise _coconut_tail_call(" + tokens[0] + ")" + tokens[1][2:]  # tokens[1] contains \n
+        return "return _coconut_tail_call(" + tokens[0] + ")" + tokens[1][2:]  # tokens[1] contains \n
     else:
-        return "raise _coconut_tail_call(" + tokens[0] + ", " + tokens[1][1:]  # tokens[1] contains )\n
+        return "return _coconut_tail_call(" + tokens[0] + ", " + tokens[1][1:]  # tokens[1] contains )\n
 
 # end: HANDLERS
 #-----------------------------------------------------------------------------------------------------------------------
@@ -1428,6 +1501,7 @@ class Grammar(object):
 
     single_parser = condense(start_marker - single_input - end_marker)
     file_parser = condense(start_marker - file_input - end_marker)
+    chunk_parser = condense(start_marker - ZeroOrMore(line) - end_marker)
     eval_parser = condense(start_marker - eval_input - end_marker)
 
 # end: MAIN GRAMMAR
@@ -1443,5 +1517,6 @@ class Grammar(object):
             (name | parens | brackets | braces | string)
             + ZeroOrMore(dot + name | brackets)
         ) + parens + end_marker, tco_return_handle)
+    tre_return = Keyword("return").suppress() + name + parens + end_marker
 
 # end: EXTRA GRAMMAR
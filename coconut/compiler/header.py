@@ -19,13 +19,192 @@ from __future__ import print_function, absolute_import, unicode_literals, divisi
 
 from coconut.root import *  # NOQA
 
+import re
+
 from coconut.constants import (
     hash_prefix,
     tabideal,
     default_encoding,
 )
 from coconut.exceptions import CoconutInternalException
-from coconut.compiler.util import target_info
+from coconut.compiler.util import (
+    target_info,
+    split_args,
+)
+
+#-----------------------------------------------------------------------------------------------------------------------
+# TREE SHAKING:
+#-----------------------------------------------------------------------------------------------------------------------
+
+name_regex = re.compile(r"(?<![\w.])[A-Za-z_]\w*", re.U)
+string_regex = re.compile(r'"(?:[^"\\\n]|\\.)*"|\'(?:[^\'\\\n]|\\.)*\'', re.U)
+def_regex = re.compile(r"(?:def|class)\s+(\w+)", re.U)
+assign_regex = re.compile(r"(\w+(?:\s*,\s*\w+)*)\s*=(?!=)(.*)$", re.U)
+import_regex = re.compile(r"(?:from\s+(?!__future__\b)[\w.]+\s+)?import\s+([\w., ]+)$", re.U)
+continuation_starts = ("else:", "elif ", "except", "finally:")
+version_check_start = "if _coconut_sys.version_info"
+
+
+def get_refs(code):
+    """Gets the names referred to in code, ignoring those in strings."""
+    return set(name_regex.findall(string_regex.sub('""', code)))
+
+
+def indent_by(code, depth):
+    """Indents the non-empty lines of code by depth levels."""
+    return "".join((" " * tabideal * depth if line.strip() else "") + line for line in code.splitlines(True))
+
+
+def split_header(header):
+    """Splits header into top-level statements, keeping decorators with what they decorate."""
+    chunks = []
+    decorating = False
+    for line in header.splitlines(True):
+        if chunks and (decorating or not line.strip() or line[0].isspace() or line.startswith(continuation_starts)):
+            chunks[-1] += line
+        else:
+            chunks.append(line)
+        decorating = line.startswith("@")
+    return chunks
+
+
+def chunk_refs(chunk):
+    """Gets the names chunk refers to when it is executed and the names it only refers to once called."""
+    eager, lazy = set(), set()
+    def_indent = None
+    for line in chunk.splitlines():
+        indent = len(line) - len(line.lstrip())
+        if def_indent is not None and (indent > def_indent or not line.strip()):
+            lazy.update(get_refs(line))
+        else:
+            eager.update(get_refs(line))
+            def_indent = indent if line.lstrip().startswith("def ") else None
+    return eager, lazy
+
+
+def header_items(header):
+    """Splits header into items, each a list of [code, defined names or None if always needed, eager refs, lazy refs, branch].
+
+    Code is either a chunk of text, an ("assign", chunk index, target, value, tail) part of an assignment
+    to multiple names, or a ("block", kind, line) marker around the items in each branch of a version check.
+    Branch is None outside of version checks and otherwise a (chunk index, kind, opening line) of the version check and which branch of it."""
+    items = []
+    for chunk_index, chunk in enumerate(split_header(header)):
+        lines = chunk.splitlines(True)
+        if chunk.startswith(version_check_start) and "else:\n" in lines and not any(line.startswith("elif ") for line in lines):
+            else_index = lines.index("else:\n")
+            items.append([("block", "if", lines[0]), None, get_refs(lines[0]), set(), None])
+            for kind, branch in (("else", lines[1:else_index]), ("end", lines[else_index + 1:])):
+                for item in header_items("".join(line[tabideal:] if line.startswith(" " * tabideal) else line for line in branch)):
+                    if item[4] is None:
+                        item[4] = (chunk_index, kind, lines[0])
+                    items.append(item)
+                items.append([("block", kind, "else:\n" if kind == "else" else None), None, set(), set(), None])
+            continue
+        eager, lazy = chunk_refs(chunk)
+        first = chunk.lstrip("\n")
+        while first.startswith("@"):
+            first = first.split("\n", 1)[1]
+        def_match = def_regex.match(first)
+        assign_match = assign_regex.match(chunk.rstrip("\n")) if "\n" not in chunk.rstrip("\n") else None
+        if def_match:
+            items.append([chunk, (def_match.group(1),), eager, lazy, None])
+        elif assign_match:
+            targets, values = split_args(assign_match.group(1)), split_args(assign_match.group(2))
+            if len(targets) > 1 and len(targets) == len(values):
+                tail = chunk[len(chunk.rstrip("\n")):]
+                for target, value in zip(targets, values):
+                    items.append([("assign", chunk_index, target, value, tail), (target,), get_refs(value), set(), None])
+            else:
+                items.append([chunk, tuple(targets), eager, lazy, None])
+        else:
+            items.append([chunk, None, eager, lazy, None])
+    return items
+
+
+def defined_names(header):
+    """Gets the names header defines whichever branch of its version checks runs, and a list
+    of (opening line, names only defined if true, names only defined if false) for each version check."""
+    always, branches = set(), {}
+    for item in header_items(header):
+        names = set(item[1] or ())
+        if item[1] is None and not isinstance(item[0], tuple):
+            import_match = import_regex.match(item[0].strip())
+            if import_match:
+                names.update(name.split(" as ")[-1].strip().split(".")[0] for name in import_match.group(1).split(","))
+        if item[4] is None:
+            always.update(names)
+        else:
+            branches.setdefault(item[4][0], (item[4][2], set(), set()))[1 if item[4][1] == "else" else 2].update(names)
+    for _, if_names, else_names in branches.values():
+        always.update(if_names & else_names)
+    return always, [(line, if_names - always, else_names - always) for _, (line, if_names, else_names) in sorted(branches.items())]
+
+
+def tree_shake(header, used_names):
+    """Removes the definitions in header that aren't needed by code using used_names."""
+    items = header_items(header)
+    final_defs = {}
+    for i, item in enumerate(items):
+        for name in item[1] or ():
+            final_defs.setdefault(name, []).append(i)
+
+    def resolve(names, before=None):
+        """Gets the indices of the items defining names, as seen from before the given index."""
+        for name in names:
+            for i in reversed(final_defs.get(name, ())):
+                if before is None or i < before:
+                    yield i
+                    branch = items[i][4]
+                    if branch is not None:  # also keep the definitions in the other branch of the version check
+                        for j in final_defs[name]:
+                            if items[j][4] is not None and items[j][4][0] == branch[0]:
+                                yield j
+                    break
+    needed = set()
+    to_check = list(resolve(used_names))
+    for i, item in enumerate(items):
+        if item[1] is None:
+            to_check.append(i)
+    while to_check:
+        i = to_check.pop()
+        if i not in needed:
+            needed.add(i)
+            to_check.extend(resolve(items[i][2], i))
+            to_check.extend(resolve(items[i][3]))
+
+    out = []
+    depth = 0
+    empty_block = False
+    pairs = []
+    for i, item in enumerate(items):
+        code = item[0]
+        text = None
+        if not isinstance(code, tuple):
+            if i in needed:
+                text = code
+        elif code[0] == "assign":
+            _, chunk_index, target, value, tail = code
+            if i in needed:
+                pairs.append((target, value))
+            next_code = items[i + 1][0] if i + 1 < len(items) else None
+            if pairs and not (isinstance(next_code, tuple) and next_code[:2] == ("assign", chunk_index)):
+                text = ", ".join(t for t, _ in pairs) + " = " + ", ".join(v for _, v in pairs) + tail
+                pairs = []
+        else:  # block marker
+            _, kind, line = code
+            if kind != "if":
+                if empty_block:
+                    out.append(indent_by("pass\n", depth))
+                depth -= 1
+            if line is not None:
+                out.append(indent_by(line, depth))
+                depth += 1
+            empty_block = line is not None
+        if text is not None:
+            out.append(indent_by(text, depth))
+            empty_block = False
+    return "".join(out)
 
 #-----------------------------------------------------------------------------------------------------------------------
 # MAIN:
@@ -60,8 +239,8 @@ def minify(compiled):
     return compiled
 
 
-def getheader(which, target="", usehash=None):
-    """Generates the specified header."""
+def getheader(which, target="", usehash=None, used_names=None):
+    """Generates the specified header. If used_names is given, a file or runtime header only includes what they need."""
     if which == "none":
         return ""
     elif which == "initial" or which == "package":
@@ -109,6 +288,24 @@ for name in dir(__coconut__):
     if name.startswith("_") and not name.startswith("__"):
         globals()[name] = getattr(__coconut__, name)
 '''
+        elif which == "runtime":
+            names, version_checks = defined_names(getheader("code", target))
+            if used_names is not None:
+                names &= used_names
+                version_checks = [(line, if_names & used_names, else_names & used_names) for line, if_names, else_names in version_checks]
+            version_checks = [version_check for version_check in version_checks if version_check[1] or version_check[2]]
+            if version_checks:
+                names.add("_coconut_sys")
+            if names:
+                header += "from coconut.__coconut__ import " + ", ".join(sorted(names)) + "\n"
+            for line, if_names, else_names in version_checks:
+                header += line + " " * tabideal
+                if if_names:
+                    header += "from coconut.__coconut__ import " + ", ".join(sorted(if_names)) + "\n"
+                else:
+                    header += "pass\n"
+                if else_names:
+                    header += "else:\n" + " " * tabideal + "from coconut.__coconut__ import " + ", ".join(sorted(else_names)) + "\n"
         elif which == "package" or which == "code" or which == "file":
             header += r'''import sys as _coconut_sys
 '''
@@ -120,6 +317,16 @@ for name in dir(__coconut__):
                 header += PY2_HEADER
             else:
                 header += PYCHECK_HEADER
+            header += r'''
+class _coconut_lazy_module(object):
+    """Imports the module it is named after the first time it is looked up on a class, then replaces itself with it."""
+    __slots__ = ("name", "attr")
+    def __init__(self, name, attr=None):
+        self.name, self.attr = name, name if attr is None else attr
+    def __get__(self, obj, objtype=None):
+        module = __import__(self.name)
+        setattr(objtype, self.attr, module)
+        return module'''
             if target.startswith("3"):
                 header += r'''
 class _coconut:'''
@@ -127,7 +334,8 @@ class _coconut:'''
                 header += r'''
 class _coconut(object):'''
             header += r'''
-    import collections, functools, imp, itertools, operator, types, copy, pickle
+    import collections, functools, itertools, operator
+    asyncio, copy, imp, mmap, multiprocessing, os, pickle, queue, tempfile, threading, types, weakref = _coconut_lazy_module("asyncio"), _coconut_lazy_module("copy"), _coconut_lazy_module("imp"), _coconut_lazy_module("mmap"), _coconut_lazy_module("multiprocessing"), _coconut_lazy_module("os"), _coconut_lazy_module("pickle"), _coconut_lazy_module("queue" if _coconut_sys.version_info >= (3,) else "Queue", "queue"), _coconut_lazy_module("tempfile"), _coconut_lazy_module("threading"), _coconut_lazy_module("types"), _coconut_lazy_module("weakref")
 '''
             if target.startswith("2"):
                 header += r'''    abc = collections'''
@@ -138,16 +346,36 @@ class _coconut(object):'''
         import collections.abc as abc'''
             if target.startswith("3"):
                 header += r'''
-    IndexError, NameError, ValueError, map, zip, dict, frozenset, getattr, hasattr, hash, isinstance, iter, len, list, min, next, object, range, reversed, set, slice, super, tuple, repr = IndexError, NameError, ValueError, map, zip, dict, frozenset, getattr, hasattr, hash, isinstance, iter, len, list, min, next, object, range, reversed, set, slice, super, tuple, repr
+    EnvironmentError, IndexError, NameError, RuntimeError, StopIteration, TypeError, ValueError, map, zip, bytearray, bytes, callable, dict, frozenset, getattr, hasattr, hash, id, isinstance, iter, len, list, memoryview, min, next, object, open, property, range, reversed, set, slice, super, tuple, type, repr = EnvironmentError, IndexError, NameError, RuntimeError, StopIteration, TypeError, ValueError, map, zip, bytearray, bytes, callable, dict, frozenset, getattr, hasattr, hash, id, isinstance, iter, len, list, memoryview, min, next, object, open, property, range, reversed, set, slice, super, tuple, type, repr
 '''
             else:
                 header += r'''
-    IndexError, NameError, ValueError, map, zip, dict, frozenset, getattr, hasattr, hash, isinstance, iter, len, list, min, next, object, range, reversed, set, slice, super, tuple, bytearray, repr = IndexError, NameError, ValueError, map, zip, dict, frozenset, getattr, hasattr, hash, isinstance, iter, len, list, min, next, object, range, reversed, set, slice, super, tuple, bytearray, staticmethod(repr)
+    EnvironmentError, IndexError, NameError, RuntimeError, StopIteration, TypeError, ValueError, map, zip, bytearray, bytes, callable, dict, frozenset, getattr, hasattr, hash, id, isinstance, iter, len, list, memoryview, min, next, object, open, property, range, reversed, set, slice, super, tuple, type, repr = EnvironmentError, IndexError, NameError, RuntimeError, StopIteration, TypeError, ValueError, map, zip, bytearray, bytes, callable, dict, frozenset, getattr, hasattr, hash, id, isinstance, iter, len, list, memoryview, min, next, object, open, property, range, reversed, set, slice, super, tuple, type, staticmethod(repr)
 '''
             header += r'''
+_coconut_sequence_types, _coconut_mapping_types, _coconut_set_types = (_coconut.tuple, _coconut.list, _coconut.range), (_coconut.dict,), (_coconut.set, _coconut.frozenset)
+_coconut_iterable_types = _coconut_sequence_types + _coconut_mapping_types + _coconut_set_types
 class _coconut_MatchError(Exception):
-    """Pattern-matching error."""
-    __slots__ = ("pattern", "value")
+    """Pattern-matching error. Has attributes .pattern and .value, from which the message is only built when needed."""
+    __slots__ = ("pattern", "value", "_message")
+    def __init__(self, *args):
+        self.args, self._message = args, None
+        if _coconut.len(args) == 2:
+            self.pattern, self.value = args
+        else:
+            self.pattern = self.value = None
+    @property
+    def message(self):
+        if self._message is None:
+            if _coconut.len(self.args) == 2:
+                self._message = "pattern-matching failed for " + _coconut.repr(self.pattern) + " in " + _coconut.repr(_coconut.repr(self.value))
+            else:
+                self._message = Exception.__str__(self)
+        return self._message
+    def __str__(self):
+        return self.message
+    def __reduce__(self):
+        return (self.__class__, self.args)
 def _coconut_igetitem(iterable, index):
     if isinstance(iterable, _coconut.range) or _coconut.hasattr(iterable, "__getitem__"):
         return iterable[index]
@@ -224,32 +452,391 @@ class _coconut_map(_coconut.map):
         return self.__reduce__()
     def __copy__(self):
         return self.__class__(self._func, *_coconut_map(_coconut.copy.copy, self._iters))
-class parallel_map(_coconut_map):
+def _coconut_map_chunk(func, chunk):
+    return [func(*args) for args in chunk]
+class _coconut_shared_buffer(object):
+    """Describes a bytes, bytearray, or memoryview passed between processes in a memory-mapped file instead of by pickling it."""
+    __slots__ = ("path", "kind", "format", "shape", "readonly")
+    directory = None
+    def __init__(self, path, kind, format, shape, readonly):
+        self.path, self.kind, self.format, self.shape, self.readonly = path, kind, format, shape, readonly
+    def __reduce__(self):
+        return (self.__class__, (self.path, self.kind, self.format, self.shape, self.readonly))
+    @classmethod
+    def store(cls, obj, min_size):
+        """Writes obj to a new memory-mapped file and returns its description if obj is a memoryview or a large enough bytes or bytearray, otherwise returns obj."""
+        if min_size is None or _coconut.type(obj) not in (_coconut.bytes, _coconut.bytearray, _coconut.memoryview):
+            return obj
+        view = _coconut.memoryview(obj)
+        if (view.nbytes < min_size and _coconut.type(obj) is not _coconut.memoryview) or not view.nbytes or not view.c_contiguous:  # memoryviews can't be pickled, so always store them
+            return obj
+        if cls.directory is None:
+            cls.directory = "/dev/shm" if _coconut.os.access("/dev/shm", _coconut.os.W_OK) else _coconut.tempfile.gettempdir()
+        fd, path = _coconut.tempfile.mkstemp(prefix="coconut-", dir=cls.directory)
+        try:
+            with _coconut.os.fdopen(fd, "wb") as opened:
+                opened.write(view)
+        except _coconut.EnvironmentError:  # e.g. out of space, so just pickle obj instead
+            cls.remove(path)
+            return obj
+        return cls(path, _coconut.type(obj).__name__, view.format, view.shape, view.readonly)
+    def load(self):
+        """Gets the buffer back, only copying it if it isn't a memoryview."""
+        with _coconut.open(self.path, "rb") as opened:
+            if self.kind != "memoryview":
+                return opened.read() if self.kind == "bytes" else _coconut.bytearray(opened.read())
+            view = _coconut.memoryview(_coconut.mmap.mmap(opened.fileno(), 0, access=_coconut.mmap.ACCESS_READ if self.readonly else _coconut.mmap.ACCESS_COPY))
+        return view if self.format == "B" and _coconut.len(self.shape) == 1 else view.cast(self.format, self.shape)
+    @staticmethod
+    def remove(path):
+        try:
+            _coconut.os.remove(path)
+        except _coconut.EnvironmentError:  # e.g. still mapped on Windows
+            pass
+    @classmethod
+    def release(cls, objs):
+        """Removes the files of the descriptions among objs."""
+        for obj in objs:
+            if _coconut.isinstance(obj, cls):
+                cls.remove(obj.path)
+    @classmethod
+    def receive(cls, objs):
+        """Loads the descriptions among objs, removing their files."""
+        results = []
+        for obj in objs:
+            if _coconut.isinstance(obj, cls):
+                results.append(obj.load())
+                cls.remove(obj.path)
+            else:
+                results.append(obj)
+        return results
+def _coconut_parallel_chunk(func, chunk, min_size):
+    results, done = [], False
+    try:
+        for args in chunk:
+            results.append(_coconut_shared_buffer.store(func(*(arg.load() if _coconut.isinstance(arg, _coconut_shared_buffer) else arg for arg in args)), min_size))
+        done = True
+        return results
+    finally:
+        if not done:  # nothing will receive the results already stored, so remove their files here
+            _coconut_shared_buffer.release(results)
+class _coconut_pool_map(_coconut_map):
+    """Base class for maps that run their function on a shared concurrent.futures executor, created when first needed."""
+    __slots__ = ()
+    _executor, _options, _locks = None, {}, {}
+    @classmethod
+    def configure(cls, max_workers=None, chunksize=1, prefetch=None, initializer=None, initargs=()):
+        """Sets the number of workers, how many calls to send to a worker at once, how many of those chunks
+        to have in flight at once, and the worker initializer, shutting down the current shared executor."""
+        cls.shutdown()
+        cls._options = {"max_workers": max_workers, "chunksize": chunksize, "prefetch": prefetch, "initializer": initializer, "initargs": initargs}
+    @classmethod
+    def shutdown(cls, wait=True):
+        """Shuts down the shared executor; a new one will be created the next time one is needed."""
+        with cls._lock():
+            executor, cls._executor = cls._executor, None
+        if executor is not None:
+            executor.shutdown(wait)
+    @classmethod
+    def _lock(cls):
+        return _coconut_pool_map._locks.setdefault(cls, _coconut.threading.Lock())  # setdefault is atomic, so every thread gets the same lock
+    @classmethod
+    def _shared_executor(cls, max_workers):
+        with cls._lock():
+            if cls._executor is None:
+                cls._executor = cls._new_executor(max_workers)
+            return cls._executor
+    @classmethod
+    def _new_executor(cls, max_workers):
+        kwargs = {}
+        if cls._options.get("initializer") is not None:
+            kwargs["initializer"], kwargs["initargs"] = cls._options["initializer"], cls._options["initargs"]
+        return cls._executor_type()(max_workers, **kwargs)
+    def __iter__(self):
+        cls = self.__class__
+        max_workers = cls._options.get("max_workers") or cls._default_workers()
+        chunksize = cls._options.get("chunksize") or 1
+        prefetch = cls._options.get("prefetch") or 2 * max_workers
+        shared = cls._can_share()
+        executor = cls._shared_executor(max_workers) if shared else cls._new_executor(max_workers)
+        futures, args = _coconut.collections.deque(), _coconut.zip(*self._iters)
+        try:
+            while True:
+                while _coconut.len(futures) < prefetch:
+                    chunk = _coconut.tuple(_coconut.itertools.islice(args, chunksize))
+                    if not chunk:
+                        break
+                    futures.append(cls._submit(executor, self._func, chunk))
+                if not futures:
+                    break
+                for result in cls._results(futures.popleft()):
+                    yield result
+        finally:
+            for future in futures:
+                if not future.cancel():
+                    cls._abandon(future)
+            if not shared:
+                executor.shutdown()
+    @classmethod
+    def _submit(cls, executor, func, chunk):
+        return executor.submit(cls._run_chunk, func, chunk)
+    @staticmethod
+    def _results(future):
+        return future.result()
+    @staticmethod
+    def _abandon(future):
+        pass
+class parallel_map(_coconut_pool_map):
     """Multiprocessing implementation of map using concurrent.futures.
     Requires arguments to be pickleable."""
     __slots__ = ()
-    def __iter__(self):
+    _executor, _options = None, {}
+    @classmethod
+    def configure(cls, max_workers=None, chunksize=1, prefetch=None, initializer=None, initargs=(), shared_min_size=65536):
+        """Sets the options of _coconut_pool_map.configure, along with the minimum size in bytes of the bytes, bytearray,
+        and memoryview arguments and results to pass through memory-mapped files instead of pickling (None to never do so)."""
+        _coconut.super(parallel_map, cls).configure(max_workers, chunksize, prefetch, initializer, initargs)
+        cls._options["shared_min_size"] = shared_min_size
+    @classmethod
+    def _submit(cls, executor, func, chunk):
+        min_size = cls._options.get("shared_min_size", 65536) if _coconut_sys.version_info >= (3, 3) else None
+        if min_size is None:
+            return executor.submit(_coconut_map_chunk, func, chunk)
+        chunk = _coconut.tuple(_coconut.tuple(_coconut_shared_buffer.store(arg, min_size) for arg in args) for args in chunk)
+        future = executor.submit(_coconut_parallel_chunk, func, chunk, min_size)
+        future.add_done_callback(lambda _: _coconut_shared_buffer.release(arg for args in chunk for arg in args))
+        return future
+    @staticmethod
+    def _results(future):
+        return _coconut_shared_buffer.receive(future.result())
+    @staticmethod
+    def _abandon(future):
+        future.add_done_callback(lambda future: future.exception() is None and _coconut_shared_buffer.release(future.result()))
+    @staticmethod
+    def _executor_type():
         from concurrent.futures import ProcessPoolExecutor
-        with ProcessPoolExecutor() as executor:
-            return _coconut.iter(_coconut.tuple(executor.map(self._func, *self._iters)))
+        return ProcessPoolExecutor
+    @staticmethod
+    def _default_workers():
+        return _coconut.multiprocessing.cpu_count()
+    @staticmethod
+    def _can_share():
+        return _coconut.multiprocessing.current_process().name == "MainProcess"  # worker processes use their own executors
     def __repr__(self):
         return "parallel_" + _coconut_map.__repr__(self)
-class concurrent_map(_coconut_map):
+class concurrent_map(_coconut_pool_map):
     """Multithreading implementation of map using concurrent.futures."""
     __slots__ = ()
-    def __iter__(self):
-        from concurrent.futures import ThreadPoolExecutor'''
-            if target_info(target) >= (3, 5):
-                header += r'''
-        with ThreadPoolExecutor() as executor:'''
-            else:
-                header += r'''
-        from multiprocessing import cpu_count  # cpu_count() * 5 is the default Python 3 thread count
-        with ThreadPoolExecutor(cpu_count() * 5) as executor:'''
-            header += r'''
-            return _coconut.iter(_coconut.tuple(executor.map(self._func, *self._iters)))
+    _executor, _options, _local = None, {}, None
+    @staticmethod
+    def _executor_type():
+        from concurrent.futures import ThreadPoolExecutor
+        if concurrent_map._local is None:
+            concurrent_map._local = _coconut.threading.local()
+        return ThreadPoolExecutor
+    @staticmethod
+    def _default_workers():
+        return _coconut.multiprocessing.cpu_count() * 5  # the default Python 3.5 thread count
+    @staticmethod
+    def _can_share():
+        return concurrent_map._local is None or not _coconut.getattr(concurrent_map._local, "in_worker", False)  # worker threads use their own executors
+    @staticmethod
+    def _run_chunk(func, chunk):
+        concurrent_map._local.in_worker = True
+        return _coconut_map_chunk(func, chunk)
     def __repr__(self):
         return "concurrent_" + _coconut_map.__repr__(self)
+class _coconut_async_map_iter(object):
+    """Asynchronous iterator over the results of an async_map, in order or as they finish, that only starts a new call
+    when fewer than limit calls are running or finished but not yet retrieved."""
+    __slots__ = ("_func", "_args", "_limit", "_ordered", "_tasks", "_finished", "_waiter", "__weakref__")
+    def __init__(self, func, args, limit, ordered):
+        self._func, self._args, self._limit, self._ordered = func, args, limit, ordered
+        self._tasks = _coconut.collections.deque() if ordered else _coconut.set()
+        self._finished, self._waiter = _coconut.collections.deque(), None
+    def __aiter__(self):
+        return self
+    def __anext__(self):
+        self._fill()
+        if self._ordered:
+            if self._tasks:
+                return self._tasks.popleft()
+        elif self._finished:
+            return self._finished.popleft()
+        elif self._tasks:
+            self._waiter = _coconut.asyncio.Future()
+            return self._waiter
+        raise StopAsyncIteration
+    def _fill(self):
+        while self._args is not None and _coconut.len(self._tasks) + _coconut.len(self._finished) < self._limit:
+            args = _coconut.next(self._args, _coconut_sentinel)
+            if args is _coconut_sentinel:
+                self._args = None
+            elif self._ordered:
+                self._tasks.append(_coconut.asyncio.ensure_future(self._func(*args)))
+            else:
+                task = _coconut.asyncio.ensure_future(self._func(*args))
+                task.add_done_callback(_coconut.functools.partial(_coconut_async_map_iter._on_done, _coconut.weakref.ref(self)))
+                self._tasks.add(task)
+    @staticmethod
+    def _on_done(ref, task):
+        self = ref()
+        if self is None or task not in self._tasks:
+            return
+        self._tasks.remove(task)
+        waiter, self._waiter = self._waiter, None
+        if waiter is None or waiter.done():
+            self._finished.append(task)
+        else:
+            _coconut_async_map_iter._transfer(task, waiter)
+    @staticmethod
+    def _transfer(task, future):
+        if task.cancelled():
+            future.cancel()
+        elif task.exception() is not None:
+            future.set_exception(task.exception())
+        else:
+            future.set_result(task.result())
+    def close(self):
+        """Cancels the calls that haven't been retrieved yet and stops starting new ones."""
+        self._args = None
+        for task in _coconut.itertools.chain(self._tasks, self._finished, () if self._waiter is None else (self._waiter,)):
+            task.cancel()
+        self._tasks.clear()
+        self._finished.clear()
+        self._waiter = None
+    def __del__(self):
+        try:
+            self.close()
+        except _coconut.RuntimeError:  # the event loop has already been closed
+            pass
+class async_map(_coconut_map):
+    """Asynchronous implementation of map using asyncio. Requires func to return awaitables,
+    and can be iterated over with async for, awaited for a list of all the results, or indexed into for single awaitables."""
+    __slots__ = ()
+    _limit = None
+    @classmethod
+    def configure(cls, limit=None):
+        """Sets how many calls can be running or finished but not yet retrieved at once (100 by default)."""
+        cls._limit = limit
+    def _iter(self, ordered):
+        return _coconut_async_map_iter(self._func, _coconut.zip(*self._iters), self.__class__._limit or 100, ordered)
+    def __aiter__(self):
+        return self._iter(True)
+    def as_completed(self):
+        """Asynchronously iterates over the results of the calls in the order they finish."""
+        return self._iter(False)
+    def __await__(self):
+        results, calls, future = [], self._iter(True), _coconut.asyncio.Future()
+        def step(task=None):
+            if future.done():
+                return
+            elif task is not None:
+                if task.cancelled() or task.exception() is not None:
+                    return _coconut_async_map_iter._transfer(task, future)
+                results.append(task.result())
+            try:
+                task = calls.__anext__()
+            except StopAsyncIteration:
+                future.set_result(results)
+            except Exception as err:
+                future.set_exception(err)
+            else:
+                task.add_done_callback(step)
+        future.add_done_callback(lambda _: calls.close())
+        step()
+        return future.__await__()
+    def __repr__(self):
+        return "async_" + _coconut_map.__repr__(self)
+def _coconut_stage_put(queue, stop, obj):
+    """Puts obj in queue, giving up if stop gets set while queue is full, and returns whether obj was put."""
+    while not stop.is_set():
+        try:
+            queue.put(obj, True, 0.1)
+        except _coconut.queue.Full:
+            continue
+        return True
+    return False
+def _coconut_stage_worker(func, iterable, queue, stop, chunksize):
+    """Puts the items of func(iterable) in queue in lists of up to chunksize items, followed by None, or by the exception raised along the way."""
+    try:
+        chunk = []
+        for item in func(iterable):
+            chunk.append(item)
+            if _coconut.len(chunk) >= chunksize:
+                if not _coconut_stage_put(queue, stop, chunk):
+                    return
+                chunk = []
+        if not chunk or _coconut_stage_put(queue, stop, chunk):
+            _coconut_stage_put(queue, stop, None)
+    except BaseException as err:
+        _coconut_stage_put(queue, stop, err)
+def _coconut_stage_results(get):
+    """Yields the items put by _coconut_stage_worker into the queue that get gets from, raising the exception it raised, if any."""
+    while True:
+        chunk = get()
+        if chunk is None:
+            return
+        elif _coconut.isinstance(chunk, BaseException):
+            raise chunk
+        for item in chunk:
+            yield item
+def _coconut_parallel_stage_worker(func, inputs, outputs, stop, chunksize):
+    _coconut_stage_worker(func, _coconut_stage_results(inputs.get), outputs, stop, chunksize)
+def _coconut_parallel_stage_get(queue, worker):
+    while True:
+        try:
+            return queue.get(True, 0.1)
+        except _coconut.queue.Empty:
+            if not worker.is_alive():
+                break
+    try:
+        return queue.get(False)  # the worker may have put its last chunk just before exiting
+    except _coconut.queue.Empty:
+        raise _coconut.RuntimeError("parallel_stage worker process exited before finishing")
+class _coconut_stage(object):
+    """Base class for wrappers that run an iterator-to-iterator function in a separate worker as a stage of a pipeline,
+    starting it the first time the iterator it returns is iterated over and passing its results back through a bounded queue."""
+    __slots__ = ("func", "maxsize", "chunksize")
+    def __init__(self, func, maxsize=16, chunksize=1):
+        self.func, self.maxsize, self.chunksize = func, maxsize, chunksize
+    def __repr__(self):
+        return self.__class__.__name__ + "(" + _coconut.repr(self.func) + ")"
+    def __reduce__(self):
+        return (self.__class__, (self.func, self.maxsize, self.chunksize))
+class concurrent_stage(_coconut_stage):
+    """Multithreading implementation of a pipeline stage, which runs func in its own thread."""
+    __slots__ = ()
+    def __call__(self, iterable):
+        queue, stop = _coconut.queue.Queue(self.maxsize), _coconut.threading.Event()
+        worker = _coconut.threading.Thread(target=_coconut_stage_worker, args=(self.func, iterable, queue, stop, self.chunksize))
+        worker.daemon = True
+        worker.start()
+        try:
+            for item in _coconut_stage_results(queue.get):
+                yield item
+        finally:
+            stop.set()
+class parallel_stage(_coconut_stage):
+    """Multiprocessing implementation of a pipeline stage, which runs func in its own process.
+    Requires func and the items passed to and from it to be pickleable."""
+    __slots__ = ()
+    def __call__(self, iterable):
+        inputs, outputs, stop = _coconut.multiprocessing.Queue(self.maxsize), _coconut.multiprocessing.Queue(self.maxsize), _coconut.multiprocessing.Event()
+        worker = _coconut.multiprocessing.Process(target=_coconut_parallel_stage_worker, args=(self.func, inputs, outputs, stop, self.chunksize))
+        worker.daemon = True
+        worker.start()
+        feeder = _coconut.threading.Thread(target=_coconut_stage_worker, args=(_coconut.iter, iterable, inputs, stop, self.chunksize))
+        feeder.daemon = True
+        feeder.start()
+        try:
+            for item in _coconut_stage_results(_coconut.functools.partial(_coconut_parallel_stage_get, outputs, worker)):
+                yield item
+        finally:
+            stop.set()
+            inputs.cancel_join_thread()  # don't wait at exit to flush inputs that the worker will never read
+            worker.terminate()
+            worker.join()
 class zip(_coconut.zip):
     __slots__ = ("_iters",)
     if hasattr(_coconut.zip, "__doc__"):
@@ -274,7 +861,176 @@ class zip(_coconut.zip):
     def __reduce_ex__(self, _):
         return self.__reduce__()
     def __copy__(self):
-        return self.__class__(*_coconut_map(_coconut.copy.copy, self._iters))'''
+        return self.__class__(*_coconut_map(_coconut.copy.copy, self._iters))
+class reiterable(object):
+    """reiterable(iterable) lets iterable be iterated over any number of times and indexed by storing its items as they're taken from it."""
+    __slots__ = ("_iter", "_items")
+    def __init__(self, iterable):
+        if _coconut.isinstance(iterable, reiterable):
+            self._iter, self._items = iterable._iter, iterable._items
+        else:
+            self._iter, self._items = _coconut.iter(iterable), []
+    def _fill(self, n=None):
+        """Takes items from the iterator until at least n are stored (or all of them if n is None)."""
+        if n is None:
+            self._items.extend(self._iter)
+        elif n > _coconut.len(self._items):
+            self._items.extend(_coconut.itertools.islice(self._iter, n - _coconut.len(self._items)))
+    def __iter__(self):
+        items, i = self._items, 0
+        while True:
+            if i == _coconut.len(items):
+                item = _coconut.next(self._iter, _coconut_sentinel)
+                if item is _coconut_sentinel:
+                    return
+                items.append(item)
+            yield items[i]
+            i += 1
+    def __getitem__(self, index):
+        if _coconut.isinstance(index, _coconut.slice):
+            start, stop, step = index.start, index.stop, 1 if index.step is None else index.step
+            if step > 0 and stop is None and (start is None or start >= 0):
+                return _coconut.itertools.islice(self.__iter__(), start, None, step)
+            elif step > 0 and (start is None or start >= 0) and stop >= 0:
+                self._fill(stop)
+            elif step < 0 and start is not None and start >= 0 and (stop is None or stop >= 0):
+                self._fill(start + 1)
+            else:
+                self._fill()
+        else:
+            self._fill(index + 1 if index >= 0 else None)
+        return self._items[index]
+    def __reversed__(self):
+        self._fill()
+        return _coconut.reversed(self._items)
+    def __repr__(self):
+        return "reiterable(" + _coconut.repr(self._iter) + ")"
+    def __copy__(self):
+        return self.__class__(self)
+class _coconut_lazy_list(object):
+    """Lazy list (| ... |) of the results of thunks, each of which is only called the first time its item is needed."""
+    __slots__ = ("_thunks", "_values", "_pos", "__weakref__")
+    def __init__(self, thunks):
+        self._thunks, self._values, self._pos = thunks, [_coconut_sentinel] * _coconut.len(thunks), 0
+    def _get(self, i):
+        value = self._values[i]
+        if value is _coconut_sentinel:
+            value = self._values[i] = self._thunks[i]()
+        return value
+    def __getitem__(self, index):
+        """Gets the items after the ones already iterated over without consuming them."""
+        indices = _coconut.range(self._pos, _coconut.len(self._values))[index]
+        if _coconut.isinstance(index, _coconut.slice):
+            return self.__class__(_coconut.tuple(_coconut.functools.partial(self._get, i) for i in indices))
+        return self._get(indices)
+    def __iter__(self):
+        return self
+    def __next__(self):
+        if self._pos >= _coconut.len(self._values):
+            raise _coconut.StopIteration()
+        self._pos += 1
+        return self._get(self._pos - 1)
+    next = __next__
+    def __reversed__(self):
+        for i in _coconut.reversed(_coconut.range(self._pos, _coconut.len(self._values))):
+            yield self._get(i)
+    def __len__(self):
+        return _coconut.len(self._values) - self._pos
+    def __repr__(self):
+        return "(|" + ", ".join("..." if value is _coconut_sentinel else _coconut.repr(value) for value in self._values[self._pos:]) + "|)"
+    def __copy__(self):
+        new_list = _coconut.object.__new__(self.__class__)
+        new_list._thunks, new_list._values, new_list._pos = self._thunks, self._values, self._pos
+        return new_list
+def _coconut_chain_next(cell):
+    """Gets the cell after cell in a lazy chain, producing it from the chain's iterables if needed, or None at the end.
+    Cells are [item, next] lists, where next is the next cell, None, or the (iterator, thunks, index) still producing them."""
+    while True:
+        after = cell[1]
+        if after is None or _coconut.isinstance(after, _coconut.list):
+            return after
+        iterator, thunks, i = after
+        if iterator is not None:
+            for item in iterator:
+                cell[1] = [item, after]
+                return cell[1]
+        if i == _coconut.len(thunks):
+            cell[1] = None
+        else:
+            iterable = thunks[i]()
+            if i < _coconut.len(thunks) - 1 or not _coconut.isinstance(iterable, _coconut_chain):
+                cell[1] = (_coconut.iter(iterable), thunks, i + 1)
+            elif iterable._head is not None:
+                cell[1] = iterable._head  # splice in a trailing chain that hasn't been advanced instead of nesting it, which makes one that refers to itself a cycle
+            elif iterable._thunks is thunks:
+                cell[1] = (None, thunks, 0)  # a chain that refers to itself after letting go of its first cells starts over
+            else:
+                cell[1] = (iterable, thunks, i + 1)
+def _coconut_chain_iter(cell):
+    list_type, sentinel = _coconut.list, _coconut_sentinel
+    while True:
+        after = cell[1]
+        cell = after if after.__class__ is list_type else _coconut_chain_next(cell)
+        if cell is None:
+            return
+        if cell[0] is not sentinel:
+            yield cell[0]
+class _coconut_chain(object):
+    """Lazy chain a :: b :: ... of the iterables returned by thunks, which caches each item the first time it's produced
+    so that copies of it and indexing it don't evaluate anything twice. It only keeps the cells after its cursor, along with
+    its first cells until it's first advanced and the cells it has indexed, so iterating over it takes constant memory."""
+    __slots__ = ("_thunks", "_head", "_cursor", "_pos", "_cells", "_cells_pos", "__weakref__")
+    def __init__(self, thunks):
+        self._thunks, self._head = thunks, [_coconut_sentinel, (None, thunks, 0)]
+        self._cursor, self._pos, self._cells, self._cells_pos = self._head, 0, None, 0
+    def __iter__(self):
+        return self
+    def __next__(self):
+        cell = self._cursor
+        while True:
+            after = cell[1]
+            cell = after if after.__class__ is _coconut.list else _coconut_chain_next(cell)
+            if cell is None:
+                raise _coconut.StopIteration()
+            if cell[0] is not _coconut_sentinel:
+                self._head, self._cursor = None, cell  # let the cells before the cursor go
+                self._pos += 1
+                return cell[0]
+    next = __next__
+    def __getitem__(self, index):
+        """Gets the items after the cursor without consuming them."""
+        if _coconut.isinstance(index, _coconut.slice) or index < 0:
+            return _coconut_igetitem(_coconut_chain_iter(self._cursor), index)
+        cells, skip = self._cells, self._pos - self._cells_pos  # cells holds the cells from position _cells_pos on
+        if cells is None or skip >= _coconut.len(cells):
+            cells, skip, cell = [], 0, self._cursor
+            self._cells, self._cells_pos = cells, self._pos
+        else:
+            if skip > _coconut.len(cells) // 2:  # drop the cells that have been iterated past
+                del cells[:skip]
+                skip, self._cells_pos = 0, self._pos
+            cell = cells[-1]
+        while _coconut.len(cells) <= skip + index:
+            after = cell[1]
+            cell = after if after.__class__ is _coconut.list else _coconut_chain_next(cell)
+            if cell is None:
+                raise _coconut.IndexError("chain index out of range")
+            if cell[0] is not _coconut_sentinel:
+                cells.append(cell)
+        return cells[skip + index][0]
+    def __repr__(self):
+        items, cell, seen = [], self._cursor[1], _coconut.set()
+        while _coconut.isinstance(cell, _coconut.list) and _coconut.id(cell) not in seen:
+            seen.add(_coconut.id(cell))
+            if cell[0] is not _coconut_sentinel:
+                items.append(_coconut.repr(cell[0]))
+            cell = cell[1]
+        return "(|" + ", ".join(items + ([] if cell is None else ["..."])) + "|)"
+    def __copy__(self):
+        new_chain = _coconut.object.__new__(self.__class__)
+        new_chain._thunks, new_chain._head, new_chain._cursor = self._thunks, self._head, self._cursor
+        new_chain._pos, new_chain._cells, new_chain._cells_pos = 0, None, 0
+        return new_chain'''
             if target.startswith("3"):
                 header += r'''
 class count:'''
@@ -317,52 +1073,232 @@ class count(object):'''
         return self.__class__(self._start, self._step)
     def __eq__(self, other):
         reduction = self.__reduce__()
-        return _coconut.isinstance(other, reduction[0]) and reduction[1] == other.__reduce__()[1]
-class _coconut_tail_call(Exception):
+        return _coconut.isinstance(other, reduction[0]) and reduction[1] == other.__reduce__()[1]'''
+            if target.startswith("3"):
+                header += r'''
+class _coconut_tail_call:'''
+            else:
+                header += r'''
+class _coconut_tail_call(object):'''
+            header += r'''
+    """Tail call returned by a function decorated with _coconut_tco for its loop to make."""
     __slots__ = ("func", "args", "kwargs")
     def __init__(self, func, *args, **kwargs):
         self.func, self.args, self.kwargs = func, args, kwargs
+_coconut_tco_func_dict = {}
 def _coconut_tco(func):
     @_coconut.functools.wraps(func)
     def tail_call_optimized_func(*args, **kwargs):
         call_func = func
         while True:
-            if "_coconut_inside_tco" in kwargs:
-                del kwargs["_coconut_inside_tco"]
-                return call_func(*args, **kwargs)
-            if hasattr(call_func, "_coconut_is_tco"):
-                kwargs["_coconut_inside_tco"] = call_func._coconut_is_tco
-            try:
-                return call_func(*args, **kwargs)
-            except _coconut_tail_call as tail_call:
-                call_func, args, kwargs = tail_call.func, tail_call.args, tail_call.kwargs
-    tail_call_optimized_func._coconut_is_tco = True
+            ref_func = _coconut_tco_func_dict.get(_coconut.id(call_func))
+            if ref_func is not None and ref_func[0]() is call_func:
+                call_func = ref_func[1]
+            elif _coconut.isinstance(call_func, _coconut.types.MethodType) and call_func.__self__ is not None:
+                ref_func = _coconut_tco_func_dict.get(_coconut.id(call_func.__func__))
+                if ref_func is not None and ref_func[0]() is call_func.__func__:
+                    call_func, args = ref_func[1], (call_func.__self__,) + args
+            result = call_func(*args, **kwargs)
+            if not _coconut.isinstance(result, _coconut_tail_call):
+                return result
+            call_func, args, kwargs = result.func, result.args, result.kwargs
+    func_id = _coconut.id(tail_call_optimized_func)
+    _coconut_tco_func_dict[func_id] = (_coconut.weakref.ref(tail_call_optimized_func, _coconut.functools.partial(_coconut_tco_func_dict.pop, func_id)), func)
     return tail_call_optimized_func
-def recursive_iterator(func):
-    """Decorates a function by optimizing it for iterator recursion.
-    Requires function arguments to be pickleable."""
-    tee_store = {}
+_coconut_pattern_marker, _coconut_sentinel = _coconut.object(), _coconut.object()
+class _coconut_cache_info(_coconut.tuple):
+    """Statistics of a cache, in the same format as the cache_info of a functools.lru_cache."""
+    __slots__ = ()
+    def __new__(cls, hits, misses, maxsize, currsize):
+        return _coconut.tuple.__new__(cls, (hits, misses, maxsize, currsize))
+    hits, misses, maxsize, currsize = _coconut.property(_coconut.operator.itemgetter(0)), _coconut.property(_coconut.operator.itemgetter(1)), _coconut.property(_coconut.operator.itemgetter(2)), _coconut.property(_coconut.operator.itemgetter(3))
+    def __repr__(self):
+        return "CacheInfo(hits=" + _coconut.repr(self[0]) + ", misses=" + _coconut.repr(self[1]) + ", maxsize=" + _coconut.repr(self[2]) + ", currsize=" + _coconut.repr(self[3]) + ")"
+    def __reduce__(self):
+        return (self.__class__, _coconut.tuple(self))
+def _coconut_cache_key(args, kwargs):
+    """Gets the key to cache a call under: its arguments if they're hashable, otherwise their pickle, or None if they're neither."""
+    try:
+        key = args + (_coconut_sentinel, _coconut.frozenset(kwargs.items())) if kwargs else args
+        _coconut.hash(key)
+        return key
+    except _coconut.TypeError:
+        try:
+            return _coconut.pickle.dumps((args, kwargs), _coconut.pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            return None
+def recursive_iterator(maxsize=None, func=None):
+    """Decorates a function by optimizing it for iterator recursion, keeping at most maxsize of its iterators (unbounded if None)
+    and dropping each one once the copy of it returned by the call that created it is gone. Use as @recursive_iterator or @recursive_iterator(maxsize)."""
+    if func is None:
+        if not _coconut.callable(maxsize):
+            return _coconut.functools.partial(recursive_iterator, maxsize)
+        maxsize, func = None, maxsize
+    tee_store, stats, lock = {} if maxsize is None else _coconut.collections.OrderedDict(), [0, 0], _coconut.threading.RLock()  # reentrant since release can run on garbage collection while the lock is held
+    def release(key, entry, ref):
+        with lock:
+            if tee_store.get(key) is entry:
+                del tee_store[key]
     @_coconut.functools.wraps(func)
     def recursive_iterator_func(*args, **kwargs):
-        hashable_args_kwargs = _coconut.pickle.dumps((args, kwargs), _coconut.pickle.HIGHEST_PROTOCOL)
-        if hashable_args_kwargs in tee_store:
-            to_tee = tee_store[hashable_args_kwargs]
-        else:
-            to_tee = func(*args, **kwargs)
-        tee_store[hashable_args_kwargs], to_return = _coconut_tee(to_tee)
+        key = _coconut_cache_key(args, kwargs)
+        if key is None:
+            return func(*args, **kwargs)
+        with lock:
+            entry = tee_store.get(key)
+            if entry is not None:
+                stats[0] += 1
+                if maxsize is not None:
+                    tee_store[key] = tee_store.pop(key)
+            else:
+                stats[1] += 1
+        if entry is None:
+            entry = [func(*args, **kwargs), None]
+            with lock:
+                if maxsize is not None:
+                    while tee_store and _coconut.len(tee_store) >= maxsize:
+                        tee_store.popitem(False)
+                if maxsize is None or maxsize > 0:
+                    tee_store[key] = entry
+        with lock:
+            entry[0], to_return = _coconut_tee(entry[0])
+            if entry[1] is None:
+                try:  # the copies returned by recursive calls are kept alive by the stored copy, so only track the first one
+                    entry[1] = _coconut.weakref.ref(to_return, _coconut.functools.partial(release, key, entry))
+                except _coconut.TypeError:  # e.g. a tuple, which takes no extra memory to keep around
+                    entry[1] = False
         return to_return
+    def cache_info():
+        return _coconut_cache_info(stats[0], stats[1], maxsize, _coconut.len(tee_store))
+    def cache_clear():
+        with lock:
+            tee_store.clear()
+            stats[:] = [0, 0]
+    recursive_iterator_func.cache_info, recursive_iterator_func.cache_clear = cache_info, cache_clear
     return recursive_iterator_func
+def memoize(maxsize=128, func=None):
+    """Decorates a function by caching up to maxsize of its results (unbounded if None), evicting the least recently used one first,
+    and, if it's tail call optimized, also caching the result under the arguments of each of the tail calls to itself that it makes.
+    Use as @memoize or @memoize(maxsize)."""
+    if func is None:
+        if not _coconut.callable(maxsize):
+            return _coconut.functools.partial(memoize, maxsize)
+        maxsize, func = 128, maxsize
+    cache, stats, lock = {} if maxsize is None else _coconut.collections.OrderedDict(), [0, 0], _coconut.threading.Lock()
+    ref_func = _coconut_tco_func_dict.get(_coconut.id(func))
+    tco_func = ref_func[1] if ref_func is not None and ref_func[0]() is func else None
+    def lookup(key):
+        with lock:
+            result = cache.get(key, _coconut_sentinel)
+            if result is _coconut_sentinel:
+                stats[1] += 1
+            else:
+                stats[0] += 1
+                if maxsize is not None:
+                    cache[key] = cache.pop(key)
+        return result
+    def store(key, result):
+        with lock:
+            if maxsize is not None:
+                while cache and _coconut.len(cache) >= maxsize:
+                    cache.popitem(False)
+            if maxsize is None or maxsize > 0:
+                cache[key] = result
+    @_coconut.functools.wraps(func)
+    def memoized_func(*args, **kwargs):
+        key = _coconut_cache_key(args, kwargs)
+        if key is None:
+            return func(*args, **kwargs)
+        result = lookup(key)
+        if result is not _coconut_sentinel:
+            return result
+        elif tco_func is None:
+            result = func(*args, **kwargs)
+            store(key, result)
+            return result
+        keys, result = [key], tco_func(*args, **kwargs)
+        while _coconut.isinstance(result, _coconut_tail_call):  # run the tail call loop here so that the calls to memoized_func in it are cached
+            call_func, args, kwargs = result.func, result.args, result.kwargs
+            if call_func is memoized_func:
+                key = _coconut_cache_key(args, kwargs)
+                result = _coconut_sentinel if key is None else lookup(key)
+                if result is not _coconut_sentinel:
+                    break
+                elif key is not None:
+                    keys.append(key)
+                call_func = tco_func
+            else:
+                ref_func = _coconut_tco_func_dict.get(_coconut.id(call_func))
+                if ref_func is not None and ref_func[0]() is call_func:
+                    call_func = ref_func[1]
+            result = call_func(*args, **kwargs)
+        for key in keys:
+            store(key, result)
+        return result
+    def memoized_step(*args, **kwargs):  # what other tail call loops call instead of memoized_func, so that they don't recurse
+        key = _coconut_cache_key(args, kwargs)
+        result = _coconut_sentinel if key is None else lookup(key)
+        if result is _coconut_sentinel:
+            result = tco_func(*args, **kwargs)
+            if key is not None and not _coconut.isinstance(result, _coconut_tail_call):
+                store(key, result)
+        return result
+    if tco_func is not None:
+        func_id = _coconut.id(memoized_func)
+        _coconut_tco_func_dict[func_id] = (_coconut.weakref.ref(memoized_func, _coconut.functools.partial(_coconut_tco_func_dict.pop, func_id)), memoized_step)
+    def cache_info():
+        return _coconut_cache_info(stats[0], stats[1], maxsize, _coconut.len(cache))
+    def cache_clear():
+        with lock:
+            cache.clear()
+            stats[:] = [0, 0]
+    memoized_func.cache_info, memoized_func.cache_clear = cache_info, cache_clear
+    return memoized_func
+def _coconut_pattern_cases(func):
+    """Gets the cases a pattern-matching function dispatches to, each as the function, the names of its parameters, and the
+    pattern marker of its module if it returns that marker instead of raising MatchError when passed it as its last positional argument."""
+    pattern_cases = _coconut.getattr(func, "_coconut_pattern_cases", None)
+    if pattern_cases is not None and pattern_cases[0] is func:
+        return pattern_cases[1]
+    code_func = func
+    ref_func = _coconut_tco_func_dict.get(_coconut.id(func))
+    if ref_func is not None and ref_func[0]() is func:
+        code_func = ref_func[1]
+    code = _coconut.getattr(code_func, "__code__", None)
+    if code is None or not code.co_flags & 0x04 or code.co_flags & 0x2a8:  # varargs and not varkwargs, generator, or coroutine
+        return ((func, None, None),)
+    elif code.co_varnames[code.co_argcount + _coconut.getattr(code, "co_kwonlyargcount", 0)] != "_coconut_match_to":
+        return ((func, None, None),)
+    marker = code_func.__globals__.get("_coconut_pattern_marker")  # every module has its own marker
+    if marker is None:
+        return ((func, None, None),)
+    return ((func, _coconut.frozenset(code.co_varnames[:code.co_argcount]), marker),)
+def _coconut_pattern_func(cases, wrapped):
+    """Makes a pattern-matching function that tries each of cases in order."""
+    first_cases, last_func = cases[:-1], cases[-1][0]
+    ref_func = _coconut_tco_func_dict.get(_coconut.id(last_func))
+    if ref_func is not None and ref_func[0]() is last_func:
+        last_func = ref_func[1]  # outside of any try, so let its tail calls go through the loop of pattern_func
+    @_coconut.functools.wraps(wrapped)
+    def pattern_func(*args, **kwargs):
+        for func, params, marker in first_cases:
+            try:
+                if params is not None and not kwargs:
+                    result = func(*args + (marker,))
+                    if result is not marker:
+                        return result
+                elif params is None or params.issuperset(kwargs):
+                    return func(*args, **kwargs)
+            except _coconut_MatchError:
+                pass
+        return last_func(*args, **kwargs)
+    pattern_func = _coconut_tco(pattern_func)
+    pattern_func._coconut_pattern_cases = (pattern_func, cases)  # functools.wraps copies this, so keep which function it's from
+    return pattern_func
 def addpattern(base_func):
     """Decorator to add a new case to a pattern-matching function, where the new case is checked last."""
     def pattern_adder(func):
-        @_coconut.functools.wraps(func)
-        @_coconut_tco
-        def add_pattern_func(*args, **kwargs):
-            try:
-                return base_func(*args, **kwargs)
-            except _coconut_MatchError:
-                raise _coconut_tail_call(func, *args, **kwargs)
-        return add_pattern_func
+        return _coconut_pattern_func(_coconut_pattern_cases(base_func) + _coconut_pattern_cases(func), func)
     return pattern_adder
 def prepattern(base_func):
     """Decorator to add a new case to a pattern-matching function, where the new case is checked first."""
@@ -379,7 +1315,9 @@ MatchError, map, reduce, takewhile, dropwhile, tee = _coconut_MatchError, _cocon
 '''
         else:
             raise CoconutInternalException("invalid header type", which)
-        if which == "file" or which == "module":
+        if which == "file" and used_names is not None:
+            header = tree_shake(header, used_names)
+        if which == "file" or which == "module" or which == "runtime":
             header += r'''
 # Compiled Coconut: ------------------------------------------------------
 
@@ -19,7 +19,15 @@ from __future__ import print_function, absolute_import, unicode_literals, divisi
 
 from coconut.root import *  # NOQA
 
+import sys
+import ast
+import __future__
+from collections import defaultdict
+from bisect import bisect_left
+
 from pyparsing import (
+    ParserElement,
+    ParseExpression,
     replaceWith,
     ZeroOrMore,
     Optional,
@@ -31,6 +39,8 @@ from coconut.constants import (
     downs,
     openindent,
     closeindent,
+    lnwrapper,
+    line_buffer_size,
 )
 from coconut.exceptions import CoconutInternalException
 
@@ -44,6 +54,17 @@ def target_info(target):
     return tuple(int(x) for x in target)
 
 
+def parse_python(code):
+    """Parses code as Python with Coconut's __future__ imports, returning None if it is invalid."""
+    flags = ast.PyCF_ONLY_AST
+    for feature in ("print_function", "absolute_import", "unicode_literals", "division"):
+        flags |= getattr(__future__, feature).compiler_flag
+    try:
+        return compile(code, "<string>", "exec", flags, True)
+    except (SyntaxError, ValueError, TypeError):
+        return None
+
+
 def addskip(skips, skip):
     """Adds a line skip to the skips."""
     if skip < 1:
@@ -65,6 +86,31 @@ def count_end(teststr, testchar):
     return count
 
 
+def iter_lines(inputstring):
+    """Iterates over the lines of a string like splitlines, but only splitting on new lines and without building a list."""
+    start = 0
+    while start < len(inputstring):
+        stop = inputstring.find("\n", start)
+        if stop == -1:
+            stop = len(inputstring)
+        yield inputstring[start:stop]
+        start = stop + 1
+
+
+def join_lines(lines):
+    """Joins lines with new lines, condensing them into chunks as they come in to bound memory."""
+    chunks = []
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) >= line_buffer_size:
+            chunks.append("\n".join(buffer))
+            buffer = []
+    if buffer or not chunks:
+        chunks.append("\n".join(buffer))
+    return "\n".join(chunks)
+
+
 def paren_change(inputstring):
     """Determines the parenthetical change of level."""
     count = 0
@@ -76,15 +122,43 @@ def paren_change(inputstring):
     return count
 
 
+def split_args(inputstring):
+    """Splits a list of arguments or parameters at its top-level commas."""
+    args = []
+    level = 0
+    start = 0
+    for i, c in enumerate(inputstring):
+        if c in downs:
+            level += 1
+        elif c in ups:
+            level -= 1
+        elif c == "," and not level:
+            args.append(inputstring[start:i].strip())
+            start = i + 1
+    last = inputstring[start:].strip()
+    if last:
+        args.append(last)
+    return args
+
+
 def ind_change(inputstring):
     """Determines the change in indentation level."""
     return inputstring.count(openindent) - inputstring.count(closeindent)
 
 
+def shallow_copy(item):
+    """Copies an item without copying the items it contains."""
+    if not isinstance(item, ParseExpression):
+        return item.copy()
+    new_item = ParserElement.copy(item)  # ParseExpression.copy would also copy any Forward inside, freezing its current binding
+    new_item.exprs = item.exprs[:]
+    return new_item
+
+
 def attach(item, action, copy=False):
     """Attaches a parse action to an item."""
     if copy:
-        item = item.copy()
+        item = shallow_copy(item)
     return item.addParseAction(logger.wrap_handler(action))
 
 
@@ -152,6 +226,15 @@ def split_trailing_indent(line):
     return line, indent
 
 
+def get_ln_marker(line):
+    """Gets the line number marker at the end of line, if it has one."""
+    line = split_trailing_indent(line)[0]
+    if line.endswith(lnwrapper):
+        return "#" + line.rsplit("#", 1)[1]
+    else:
+        return ""
+
+
 def match_in(grammar, text):
     """Determines if there is a match for grammar in text."""
     for result in grammar.scanString(text):
@@ -191,3 +274,74 @@ def transform(grammar, text):
         raise CoconutInternalException("failed to properly split text to be transformed")
 
     return "".join(out)
+
+
+#-----------------------------------------------------------------------------------------------------------------------
+# PARSE TRACKING:
+#-----------------------------------------------------------------------------------------------------------------------
+
+
+class ParseBudgetExceeded(Exception):
+    """Signals that a parse used up its budget of grammar element attempts."""
+
+
+class ParseTracker(object):
+    """Counts grammar element attempts during a parse, enforcing an optional budget."""
+
+    def __init__(self, names, budget=None):
+        """Creates a tracker that attributes attempts to the innermost element in names."""
+        self.names, self.budget = names, budget
+        self.attempts = 0
+        self.element_attempts = defaultdict(int)
+        self.loc_attempts = defaultdict(int)
+        self.instring = ""
+        self.stack = []
+        self.parse_no_cache = None
+        self.recursion_limit = None
+
+    def track(self, element, instring, loc, *args, **kwargs):
+        """Replaces ParserElement._parseNoCache while tracking."""
+        name = self.names.get(id(element))
+        if name is not None:
+            self.stack.append(name)
+        try:
+            self.attempts += 1
+            if self.stack:
+                self.element_attempts[self.stack[-1]] += 1
+            self.loc_attempts[loc] += 1
+            self.instring = instring
+            if self.budget is not None and self.attempts > self.budget:
+                raise ParseBudgetExceeded()
+            return self.parse_no_cache(element, instring, loc, *args, **kwargs)
+        finally:
+            if name is not None:
+                self.stack.pop()
+
+    def __enter__(self):
+        """Starts tracking."""
+        tracker = self
+        self.parse_no_cache = ParserElement._parseNoCache
+
+        def _parseNoCache(element, *args, **kwargs):
+            return tracker.track(element, *args, **kwargs)
+        ParserElement._parseNoCache = _parseNoCache
+        self.recursion_limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(3 * self.recursion_limit)  # tracking adds two frames to every one the parser uses
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Stops tracking."""
+        ParserElement._parseNoCache = self.parse_no_cache
+        sys.setrecursionlimit(self.recursion_limit)
+
+    def worst_elements(self, num):
+        """Gets the (name, attempts) of the num most attempted elements."""
+        return sorted(self.element_attempts.items(), key=lambda item: (-item[1], item[0]))[:num]
+
+    def worst_lines(self, num):
+        """Gets the (line number, attempts) of the num most attempted lines of the parsed string."""
+        newlines = [i for i, c in enumerate(self.instring) if c == "\n"]
+        line_attempts = defaultdict(int)
+        for loc, attempts in self.loc_attempts.items():
+            line_attempts[bisect_left(newlines, loc) + 1] += attempts
+        return sorted(line_attempts.items(), key=lambda item: (-item[1], item[0]))[:num]
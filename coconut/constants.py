@@ -30,6 +30,10 @@ from pyparsing import alphanums
 default_recursion_limit = 2000
 minimum_recursion_limit = 100
 
+parse_offenders = 5  # number of worst grammar elements and lines to report from a parse
+parse_chunk_lines = 500  # minimum number of preprocessed lines per chunk when parsing a file in parallel
+parallel_parse_lines = 2 * parse_chunk_lines  # minimum number of lines in a file for --jobs to parse it in parallel
+
 # used for generating __coconut_hash__
 from zlib import crc32 as checksum  # NOQA
 hash_prefix = "# __coconut_hash__ = "
@@ -51,6 +55,8 @@ else:
 default_encoding = "utf-8"
 default_whitespace_chars = " \t\f\v"
 
+line_buffer_size = 1024  # lines to buffer before condensing them when joining processed lines
+
 openindent = "\u204b"  # reverse pilcrow
 closeindent = "\xb6"  # pilcrow
 strwrapper = "\u25b6"  # right-pointing triangle
@@ -70,8 +76,10 @@ decorator_var = "_coconut_decorator"
 match_to_var = "_coconut_match_to"
 match_check_var = "_coconut_match_check"
 match_iter_var = "_coconut_match_iter"
-match_err_var = "_coconut_match_err"
-lazy_item_var = "_coconut_lazy_item"
+pattern_call_var = "_coconut_pattern_call"
+pattern_marker_var = "_coconut_pattern_marker"
+sentinel_var = "_coconut_sentinel"
+hoisted_var = "_coconut_hoisted"
 lazy_chain_var = "_coconut_lazy_chain"
 import_as_var = "_coconut_import"
 yield_from_var = "_coconut_yield_from"
@@ -81,6 +89,127 @@ stmt_lambda_var = "_coconut_lambda"
 
 wildcard = "_"  # for pattern-matching
 
+continuation_keywords = (  # start lines that continue the previous top-level statement
+    "else",
+    "elif",
+    "except",
+    "finally",
+)
+
+dynamic_names = (  # names that can reach header definitions without naming them (disable header tree shaking)
+    "eval",
+    "exec",
+    "execfile",
+    "globals",
+    "locals",
+    "vars",
+    "__import__",
+    "import_module",
+)
+
+lazy_modules = (  # _coconut attributes that import their module on first use (never hoisted, since that would import them)
+    "asyncio",
+    "copy",
+    "imp",
+    "mmap",
+    "multiprocessing",
+    "os",
+    "pickle",
+    "queue",
+    "tempfile",
+    "threading",
+    "types",
+    "weakref",
+)
+
+pure_python_nodes = (  # ast nodes the grammar compiles to themselves (others disable the pure Python fast path)
+    "Module",
+    "Expr",
+    "Assign",
+    "AugAssign",
+    "Delete",
+    "Pass",
+    "Break",
+    "Continue",
+    "If",
+    "For",
+    "While",
+    "With",
+    "withitem",
+    "Try",
+    "TryExcept",
+    "TryFinally",
+    "ExceptHandler",
+    "Raise",
+    "Assert",
+    "Global",
+    "BoolOp",
+    "BinOp",
+    "UnaryOp",
+    "IfExp",
+    "Dict",
+    "Set",
+    "ListComp",
+    "SetComp",
+    "DictComp",
+    "GeneratorExp",
+    "comprehension",
+    "Compare",
+    "Call",
+    "keyword",
+    "Num",
+    "Str",
+    "Bytes",
+    "NameConstant",
+    "Constant",
+    "Attribute",
+    "Subscript",
+    "Index",
+    "Slice",
+    "ExtSlice",
+    "Name",
+    "List",
+    "Tuple",
+    "Starred",
+    "Lambda",
+    "arguments",
+    "arg",
+    "Load",
+    "Store",
+    "Del",
+    "AugLoad",
+    "AugStore",
+    "Param",
+    "And",
+    "Or",
+    "Add",
+    "Sub",
+    "Mult",
+    "Div",
+    "Mod",
+    "Pow",
+    "LShift",
+    "RShift",
+    "BitOr",
+    "BitXor",
+    "BitAnd",
+    "FloorDiv",
+    "Invert",
+    "Not",
+    "UAdd",
+    "USub",
+    "Eq",
+    "NotEq",
+    "Lt",
+    "LtE",
+    "Gt",
+    "GtE",
+    "Is",
+    "IsNot",
+    "In",
+    "NotIn",
+)
+
 keywords = (
     "and",
     "as",
@@ -216,6 +345,7 @@ builtins = (
     "takewhile",
     "dropwhile",
     "tee",
+    "reiterable",
     "count",
     "datamaker",
     "consume",
@@ -223,7 +353,11 @@ builtins = (
     "addpattern",
     "prepattern",
     "recursive_iterator",
+    "memoize",
     "concurrent_map",
+    "async_map",
+    "concurrent_stage",
+    "parallel_stage",
     "py_chr",
     "py_filter",
     "py_hex",
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#-----------------------------------------------------------------------------------------------------------------------
+# INFO:
+#-----------------------------------------------------------------------------------------------------------------------
+
+"""
+Author: Evan Hubinger
+License: Apache 2.0
+Description: Houses the precompiled Coconut runtimes, one module per specific target, written when Coconut is built.
+"""
+
+#-----------------------------------------------------------------------------------------------------------------------
+# IMPORTS:
+#-----------------------------------------------------------------------------------------------------------------------
+
+from __future__ import print_function, absolute_import, unicode_literals, division
+
+from coconut.root import *  # NOQA
+
+import sys
+
+#-----------------------------------------------------------------------------------------------------------------------
+# CONSTANTS:
+#-----------------------------------------------------------------------------------------------------------------------
+
+runtime_targets = (  # the specific targets, newest first (can't import coconut.constants since it needs pyparsing)
+    ("36", (3, 6)),
+    ("35", (3, 5)),
+    ("33", (3, 3)),
+    ("3", (3,)),
+    ("27", (2, 7)),
+    ("2", (2,)),
+)
+
+#-----------------------------------------------------------------------------------------------------------------------
+# UTILITIES:
+#-----------------------------------------------------------------------------------------------------------------------
+
+
+def runtime_module_name(target):
+    """Gets the name of the module within coconut.runtime holding the runtime for target."""
+    return "target_" + target
+
+
+def import_sys_runtime():
+    """Imports the runtime module for the current Python version, raising ImportError if it hasn't been built."""
+    for target, version in runtime_targets:
+        if sys.version_info >= version:
+            name = "coconut.runtime." + runtime_module_name(target)
+            __import__(name)
+            return sys.modules[name]
+    raise ImportError("no Coconut runtime for Python " + ".".join(str(v) for v in sys.version_info[:2]))
+
+
+def write_runtimes(dirpath):
+    """Writes the runtime modules for every specific target to dirpath."""
+    import io
+    import os.path
+    from coconut.compiler import Compiler
+    for target, _ in runtime_targets:
+        with io.open(os.path.join(dirpath, runtime_module_name(target) + ".py"), "w", encoding="utf-8") as opened:
+            opened.write(Compiler(target).headers("package"))
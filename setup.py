@@ -25,6 +25,7 @@ from coconut.root import *  # NOQA
 
 import setuptools
 import platform
+from setuptools.command.build_py import build_py
 
 #-----------------------------------------------------------------------------------------------------------------------
 # CONSTANTS:
@@ -103,15 +104,20 @@ search_terms = [
     "takewhile",
     "dropwhile",
     "tee",
+    "reiterable",
     "consume",
     "count",
     "parallel_map",
     "concurrent_map",
+    "async_map",
+    "concurrent_stage",
+    "parallel_stage",
     "MatchError",
     "datamaker",
     "addpattern",
     "prepattern",
     "recursive_iterator",
+    "memoize",
     "data keyword",
     "match keyword",
     "case keyword",
@@ -148,6 +154,20 @@ def all_reqs_in(req_dict):
     """Gets all requirements in a requirements dict."""
     return uniqueify(req for req_list in req_dict.values() for req in req_list)
 
+
+class build_py_with_runtimes(build_py):
+    """Builds the package along with the precompiled runtimes imported by coconut.__coconut__."""
+
+    def run(self):
+        """Builds the package, then writes the runtimes into it."""
+        build_py.run(self)
+        if not self.dry_run:
+            from coconut.runtime import write_runtimes
+            try:
+                write_runtimes(os.path.join(self.build_lib, "coconut", "runtime"))
+            except ImportError as err:  # coconut.__coconut__ falls back on compiling its header
+                print("Skipping writing Coconut runtimes since the compiler can't be imported:", err)
+
 #-----------------------------------------------------------------------------------------------------------------------
 # REQUIREMENTS:
 #-----------------------------------------------------------------------------------------------------------------------
@@ -220,6 +240,9 @@ setuptools.setup(
         "tests",
     ]),
     include_package_data=True,
+    cmdclass={
+        "build_py": build_py_with_runtimes,
+    },
     entry_points={
         "console_scripts": [
             script + " = coconut.main:main"
@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#-----------------------------------------------------------------------------------------------------------------------
+# INFO:
+#-----------------------------------------------------------------------------------------------------------------------
+
+"""
+Author: Evan Hubinger
+License: Apache 2.0
+Description: Coconut benchmarks.
+"""
+
+#-----------------------------------------------------------------------------------------------------------------------
+# IMPORTS:
+#-----------------------------------------------------------------------------------------------------------------------
+
+from __future__ import print_function, absolute_import, unicode_literals, division
+
+from coconut.root import *  # NOQA
+
+import timeit
+
+#-----------------------------------------------------------------------------------------------------------------------
+# UTILITIES:
+#-----------------------------------------------------------------------------------------------------------------------
+
+
+def best_of(stmt, number=1, repeat=3, setup="pass", namespace=None):
+    """Times the best of repeat runs of number executions of stmt, either a callable or a string executed in namespace."""
+    if namespace is not None:  # timeit only takes globals on Python 3.5+, so wrap stmt in a function defined in namespace instead
+        func_namespace = dict(namespace)
+        exec("def _best_of_stmt():\n" + "\n".join("    " + line for line in stmt.splitlines()), func_namespace)
+        stmt = func_namespace["_best_of_stmt"]
+    return min(timeit.repeat(stmt, setup, number=number, repeat=repeat))
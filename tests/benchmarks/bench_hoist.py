@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#-----------------------------------------------------------------------------------------------------------------------
+# INFO:
+#-----------------------------------------------------------------------------------------------------------------------
+
+"""
+Author: Evan Hubinger
+License: Apache 2.0
+Description: Runtime benchmark for compiling with and without --hoist-helpers.
+
+Usage: python -m tests.benchmarks.bench_hoist [number of calls]
+"""
+
+#-----------------------------------------------------------------------------------------------------------------------
+# IMPORTS:
+#-----------------------------------------------------------------------------------------------------------------------
+
+from __future__ import print_function, absolute_import, unicode_literals, division
+
+from coconut.root import *  # NOQA
+
+import sys
+
+from coconut.convenience import parse, setup
+
+from tests.benchmarks import best_of
+
+#-----------------------------------------------------------------------------------------------------------------------
+# UTILITIES:
+#-----------------------------------------------------------------------------------------------------------------------
+
+source = """
+def match_pairs(values):
+    total = 0
+    for value in values:
+        case value:
+            match (a, b):
+                total += a + b
+            match {"a": a}:
+                total += a
+    return total
+
+def partials(xs):
+    total = 0
+    for x in xs:
+        total += ((+)$(1))(x)
+    return total
+
+def operators(xs):
+    total = 0
+    for x in xs:
+        total = (+)(total, (*)(x, x))
+    return total
+
+def getters(pairs):
+    total = 0
+    for pair in pairs:
+        total += pair |> .[0]
+    return total
+"""
+
+
+def compile_with(hoist_helpers):
+    """Compiles and executes the benchmarked source."""
+    setup(hoist_helpers=hoist_helpers)
+    namespace = {}
+    exec(parse(source), namespace)
+    return namespace
+
+#-----------------------------------------------------------------------------------------------------------------------
+# MAIN:
+#-----------------------------------------------------------------------------------------------------------------------
+
+
+def main(number=1000):
+    """Prints the time taken by calls to code using runtime helpers, compiled with and without --hoist-helpers."""
+    plain_namespace, hoisted_namespace = compile_with(False), compile_with(True)
+    setup()
+    benchmarks = [
+        ("pattern-matching", "match_pairs([(1, 2), {'a': 3}] * 50)"),
+        ("partials", "partials(range(100))"),
+        ("operator functions", "operators(range(100))"),
+        ("itemgetters", "getters([(1, 2)] * 100)"),
+    ]
+    print("{:<20}{:>12}{:>16}{:>16}".format("benchmark", "calls", "plain (ms)", "hoisted (ms)"))
+    for name, stmt in benchmarks:
+        print("{:<20}{:>12}{:>16.1f}{:>16.1f}".format(
+            name,
+            number,
+            best_of(stmt, number, repeat=9, namespace=plain_namespace) * 1e3,
+            best_of(stmt, number, repeat=9, namespace=hoisted_namespace) * 1e3,
+        ))
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
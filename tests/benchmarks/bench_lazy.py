@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#-----------------------------------------------------------------------------------------------------------------------
+# INFO:
+#-----------------------------------------------------------------------------------------------------------------------
+
+"""
+Author: Evan Hubinger
+License: Apache 2.0
+Description: Runtime benchmark for recursive :: chains compiled to caching lazy chains versus nested itertools.chain calls.
+
+Usage: python -m tests.benchmarks.bench_lazy [index to get]
+"""
+
+#-----------------------------------------------------------------------------------------------------------------------
+# IMPORTS:
+#-----------------------------------------------------------------------------------------------------------------------
+
+from __future__ import print_function, absolute_import, unicode_literals, division
+
+from coconut.root import *  # NOQA
+
+import sys
+import itertools
+
+from coconut.convenience import parse, setup
+from coconut.__coconut__ import recursive_iterator, _coconut_igetitem
+
+from tests.benchmarks import best_of
+
+#-----------------------------------------------------------------------------------------------------------------------
+# UTILITIES:
+#-----------------------------------------------------------------------------------------------------------------------
+
+source = """
+def nats(n=0) = (n,) :: nats(n + 1)
+
+@recursive_iterator
+def fib() = (1, 1) :: map((+), fib(), fib()$[1:])
+"""
+
+
+def compile_source():
+    """Compiles and executes the benchmarked source."""
+    setup()
+    namespace = {}
+    exec(parse(source), namespace)
+    return namespace
+
+
+def nested_chain(*thunks):
+    """Chains the iterables returned by thunks the way :: used to be compiled."""
+    return itertools.chain.from_iterable(thunk() for thunk in thunks)
+
+
+def nested_nats(n=0):
+    """Nested itertools.chain version of nats."""
+    return nested_chain(lambda: (n,), lambda: nested_nats(n + 1))
+
+
+@recursive_iterator
+def nested_fib():
+    """Nested itertools.chain version of fib."""
+    return nested_chain(lambda: (1, 1), lambda: map(lambda a, b: a + b, nested_fib(), _coconut_igetitem(nested_fib(), slice(1, None))))
+
+
+def index_each(make, index):
+    """Gets each item up to index of make()."""
+    for i in range(index):
+        _coconut_igetitem(make(), i)
+
+
+def index_shared(make, index):
+    """Gets each item up to index of a single make()."""
+    items = make()
+    for i in range(index):
+        _coconut_igetitem(items, i)
+
+#-----------------------------------------------------------------------------------------------------------------------
+# MAIN:
+#-----------------------------------------------------------------------------------------------------------------------
+
+
+def main(index=500):
+    """Prints the time taken by getting items of recursive :: chains with and without caching lazy chains."""
+    namespace = compile_source()
+    nats, fib = namespace["nats"], namespace["fib"]
+    print("{:<20}{:>12}{:>16}{:>16}".format("benchmark", "index", "nested (ms)", "lazy (ms)"))
+    for name, nested, lazy in (
+        ("nats()$[index]", lambda: _coconut_igetitem(nested_nats(), index), lambda: _coconut_igetitem(nats(), index)),
+        ("fib()$[index]", lambda: _coconut_igetitem(nested_fib(), index), lambda: _coconut_igetitem(fib(), index)),
+        ("nats()$[i] for i", lambda: index_each(nested_nats, index), lambda: index_shared(nats, index)),
+    ):
+        print("{:<20}{:>12}{:>16.3f}{:>16.3f}".format(name, index, best_of(nested) * 1e3, best_of(lazy) * 1e3))
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
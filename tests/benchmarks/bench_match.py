@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#-----------------------------------------------------------------------------------------------------------------------
+# INFO:
+#-----------------------------------------------------------------------------------------------------------------------
+
+"""
+Author: Evan Hubinger
+License: Apache 2.0
+Description: Runtime benchmark for the type checks done by pattern-matching.
+
+Usage: python -m tests.benchmarks.bench_match [number of calls]
+"""
+
+#-----------------------------------------------------------------------------------------------------------------------
+# IMPORTS:
+#-----------------------------------------------------------------------------------------------------------------------
+
+from __future__ import print_function, absolute_import, unicode_literals, division
+
+from coconut.root import *  # NOQA
+
+import sys
+
+from coconut.convenience import parse, setup
+
+from tests.benchmarks import best_of
+
+#-----------------------------------------------------------------------------------------------------------------------
+# UTILITIES:
+#-----------------------------------------------------------------------------------------------------------------------
+
+source = """
+def seq_match(value):
+    case value:
+        match (a, b, c):
+            return a + b + c
+        match [a, b]:
+            return a + b
+    return 0
+
+def dict_match(value):
+    match {"x": x, "y": y} in value:
+        return x + y
+    return 0
+
+def iter_match(value):
+    match (| a, b |) in value:
+        return a + b
+    return 0
+
+def star_match(value):
+    match (a, *rest) in value:
+        return a
+    return 0
+"""
+
+fast_type_vars = (
+    "_coconut_sequence_types",
+    "_coconut_mapping_types",
+    "_coconut_set_types",
+    "_coconut_iterable_types",
+)
+
+#-----------------------------------------------------------------------------------------------------------------------
+# MAIN:
+#-----------------------------------------------------------------------------------------------------------------------
+
+
+def main(number=100000):
+    """Prints the time taken by pattern-matching on built-in types with and without checking for them before the abcs."""
+    setup()
+    fast_namespace, abc_namespace = {}, {}
+    code = parse(source)
+    exec(code, fast_namespace)
+    exec(code, abc_namespace)
+    for var in fast_type_vars:
+        abc_namespace[var] = ()
+    benchmarks = [
+        ("tuple sequence", "seq_match((1, 2, 3))"),
+        ("list sequence", "seq_match([1, 2])"),
+        ("dict", 'dict_match({"x": 1, "y": 2})'),
+        ("iterator", "iter_match((1, 2))"),
+        ("star", "star_match([1, 2, 3])"),
+    ]
+    print("{:<20}{:>12}{:>16}{:>16}".format("benchmark", "calls", "fast (ms)", "abc only (ms)"))
+    for name, stmt in benchmarks:
+        print("{:<20}{:>12}{:>16.1f}{:>16.1f}".format(
+            name,
+            number,
+            best_of(stmt, number, repeat=5, namespace=fast_namespace) * 1e3,
+            best_of(stmt, number, repeat=5, namespace=abc_namespace) * 1e3,
+        ))
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
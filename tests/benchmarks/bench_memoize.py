@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#-----------------------------------------------------------------------------------------------------------------------
+# INFO:
+#-----------------------------------------------------------------------------------------------------------------------
+
+"""
+Author: Evan Hubinger
+License: Apache 2.0
+Description: Runtime benchmark for recursive functions with and without memoize.
+
+Usage: python -m tests.benchmarks.bench_memoize [argument to pass]
+"""
+
+#-----------------------------------------------------------------------------------------------------------------------
+# IMPORTS:
+#-----------------------------------------------------------------------------------------------------------------------
+
+from __future__ import print_function, absolute_import, unicode_literals, division
+
+from coconut.root import *  # NOQA
+
+import sys
+
+from coconut.convenience import parse, setup
+
+from tests.benchmarks import best_of
+
+#-----------------------------------------------------------------------------------------------------------------------
+# UTILITIES:
+#-----------------------------------------------------------------------------------------------------------------------
+
+source = """
+def fib(n) = n if n < 2 else fib(n - 1) + fib(n - 2)
+
+@memoize
+def memo_fib(n) = n if n < 2 else memo_fib(n - 1) + memo_fib(n - 2)
+
+def pattern_fib(0) = 0
+@addpattern(pattern_fib)
+def pattern_fib(1) = 1
+@addpattern(pattern_fib)
+def pattern_fib(n) = pattern_fib(n - 1) + pattern_fib(n - 2)
+
+def memo_pattern_fib(0) = 0
+@addpattern(memo_pattern_fib)
+def memo_pattern_fib(1) = 1
+@memoize
+def memo_pattern_fib_case(n) = memo_pattern_fib(n - 1) + memo_pattern_fib(n - 2)
+memo_pattern_fib = addpattern(memo_pattern_fib)(memo_pattern_fib_case)
+"""
+
+
+def compile_source():
+    """Compiles and executes the benchmarked source."""
+    setup()
+    namespace = {}
+    exec(parse(source), namespace)
+    return namespace
+
+#-----------------------------------------------------------------------------------------------------------------------
+# MAIN:
+#-----------------------------------------------------------------------------------------------------------------------
+
+
+def main(arg=22):
+    """Prints the time taken by recursive Fibonacci functions with and without memoize, starting from an empty cache."""
+    namespace = compile_source()
+    memo_fib, memo_case = namespace["memo_fib"], namespace["memo_pattern_fib_case"]
+    print("{:<20}{:>12}{:>16}{:>16}".format("benchmark", "argument", "plain (ms)", "memoized (ms)"))
+    for name, plain, memoized, clear in (
+        ("fib", namespace["fib"], memo_fib, memo_fib.cache_clear),
+        ("pattern-matching", namespace["pattern_fib"], namespace["memo_pattern_fib"], memo_case.cache_clear),
+    ):
+        print("{:<20}{:>12}{:>16.3f}{:>16.3f}".format(
+            name,
+            arg,
+            best_of(lambda: plain(arg), repeat=5) * 1e3,
+            best_of(lambda: memoized(arg), repeat=5, setup=clear) * 1e3,
+        ))
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#-----------------------------------------------------------------------------------------------------------------------
+# INFO:
+#-----------------------------------------------------------------------------------------------------------------------
+
+"""
+Author: Evan Hubinger
+License: Apache 2.0
+Description: Peak memory benchmark for the line-oriented compiler stages.
+
+Usage: python -m tests.benchmarks.bench_memory [number of source lines]
+"""
+
+#-----------------------------------------------------------------------------------------------------------------------
+# IMPORTS:
+#-----------------------------------------------------------------------------------------------------------------------
+
+from __future__ import print_function, absolute_import, unicode_literals, division
+
+from coconut.root import *  # NOQA
+
+import sys
+import tracemalloc
+
+from coconut.constants import lnwrapper
+from coconut.compiler import Compiler
+
+#-----------------------------------------------------------------------------------------------------------------------
+# UTILITIES:
+#-----------------------------------------------------------------------------------------------------------------------
+
+
+def gen_source(num_lines):
+    """Generates Coconut source with the given number of lines."""
+    lines = []
+    while len(lines) < num_lines:
+        i = len(lines)
+        lines.append("def func_" + str(i) + "(x):")
+        lines.append("    if x > " + str(i) + ":")
+        lines.append("        return (x, " + str(i) + ")  # comment " + str(i))
+        lines.append("    return x")
+    return "\n".join(lines) + "\n"
+
+
+def peak_of(func, *args):
+    """Measures the peak memory allocated while calling func, not counting its arguments."""
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        func(*args)
+        return tracemalloc.get_traced_memory()[1] - base
+    finally:
+        tracemalloc.stop()
+
+
+def materialize(inputstring):
+    """Splits inputstring into a list of lines and joins them back, as the stages used to."""
+    return "\n".join([line for line in inputstring.splitlines()])
+
+#-----------------------------------------------------------------------------------------------------------------------
+# MAIN:
+#-----------------------------------------------------------------------------------------------------------------------
+
+
+def main(num_lines=200000):
+    """Prints the peak memory of each line-oriented stage next to that of materializing its input's lines."""
+    comp = Compiler(line_numbers=True)
+    comp.reset()
+    source = comp.passthrough_proc(comp.str_proc(comp.prepare(gen_source(num_lines))))
+    indented = comp.ind_proc(source)
+    numbered = "\n".join(line + "#" + comp.add_ref(ln) + lnwrapper for ln, line in enumerate(indented.splitlines(), 1))
+    stages = [
+        ("ind_proc", comp.ind_proc, source),
+        ("reind_proc", comp.reind_proc, indented),
+        ("endline_repl", comp.endline_repl, numbered),
+        ("polish", comp.polish, indented),
+    ]
+    print("{:<14}{:>12}{:>14}{:>16}".format("stage", "input (MB)", "peak (MB)", "splitlines (MB)"))
+    for name, stage, inputstring in stages:
+        print("{:<14}{:>12.1f}{:>14.1f}{:>16.1f}".format(
+            name,
+            sys.getsizeof(inputstring) / 1e6,
+            peak_of(stage, inputstring) / 1e6,
+            peak_of(materialize, inputstring) / 1e6,
+        ))
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
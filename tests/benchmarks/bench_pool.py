@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#-----------------------------------------------------------------------------------------------------------------------
+# INFO:
+#-----------------------------------------------------------------------------------------------------------------------
+
+"""
+Author: Evan Hubinger
+License: Apache 2.0
+Description: Runtime benchmark for calling parallel_map and concurrent_map repeatedly with and without reusing their executors.
+
+Usage: python -m tests.benchmarks.bench_pool [number of calls] [items per call]
+"""
+
+#-----------------------------------------------------------------------------------------------------------------------
+# IMPORTS:
+#-----------------------------------------------------------------------------------------------------------------------
+
+from __future__ import print_function, absolute_import, unicode_literals, division
+
+from coconut.root import *  # NOQA
+
+import sys
+import timeit
+
+from coconut.__coconut__ import parallel_map, concurrent_map
+
+#-----------------------------------------------------------------------------------------------------------------------
+# UTILITIES:
+#-----------------------------------------------------------------------------------------------------------------------
+
+
+def square(x):
+    """Squares x."""
+    return x * x
+
+
+def time_calls(map_type, number, items, fresh):
+    """Times number calls of map_type over items, shutting down its executor after each one if fresh."""
+    def run():
+        for _ in range(number):
+            tuple(map_type(square, range(items)))
+            if fresh:
+                map_type.shutdown()
+    run()  # start up the shared executor outside of the timing
+    elapsed = timeit.timeit(run, number=1)
+    map_type.shutdown()
+    return elapsed
+
+#-----------------------------------------------------------------------------------------------------------------------
+# MAIN:
+#-----------------------------------------------------------------------------------------------------------------------
+
+
+def main(number=50, items=100):
+    """Prints the time taken by repeated calls to parallel_map and concurrent_map with a new or a shared executor each time."""
+    print("{:<20}{:>12}{:>16}{:>16}".format("benchmark", "calls", "fresh (ms)", "shared (ms)"))
+    for name, map_type in (("parallel_map", parallel_map), ("concurrent_map", concurrent_map)):
+        print("{:<20}{:>12}{:>16.1f}{:>16.1f}".format(
+            name,
+            number,
+            time_calls(map_type, number, items, True) * 1e3,
+            time_calls(map_type, number, items, False) * 1e3,
+        ))
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#-----------------------------------------------------------------------------------------------------------------------
+# INFO:
+#-----------------------------------------------------------------------------------------------------------------------
+
+"""
+Author: Evan Hubinger
+License: Apache 2.0
+Description: Runtime and memory benchmark for recursive_iterator with hashable arguments, which are used as cache keys
+directly, and unhashable arguments, which have to be pickled.
+
+Usage: python -m tests.benchmarks.bench_recursive [number of calls]
+"""
+
+#-----------------------------------------------------------------------------------------------------------------------
+# IMPORTS:
+#-----------------------------------------------------------------------------------------------------------------------
+
+from __future__ import print_function, absolute_import, unicode_literals, division
+
+from coconut.root import *  # NOQA
+
+import sys
+
+from coconut.__coconut__ import recursive_iterator
+
+from tests.benchmarks import best_of
+
+#-----------------------------------------------------------------------------------------------------------------------
+# UTILITIES:
+#-----------------------------------------------------------------------------------------------------------------------
+
+
+@recursive_iterator
+def repeat_tuple(xs):
+    """Repeats the tuple xs forever."""
+    for x in xs:
+        yield x
+    for x in repeat_tuple(xs):
+        yield x
+
+
+@recursive_iterator
+def repeat_list(xs):
+    """Repeats the list xs forever."""
+    for x in xs:
+        yield x
+    for x in repeat_list(xs):
+        yield x
+
+
+def time_calls(func, args, number):
+    """Times taking the first item of func(args(i)) for number values of i."""
+    def run():
+        for i in range(number):
+            next(func(args(i)))
+    return best_of(run)
+
+#-----------------------------------------------------------------------------------------------------------------------
+# MAIN:
+#-----------------------------------------------------------------------------------------------------------------------
+
+
+def main(number=50000):
+    """Prints the time taken by calls to recursive iterators with hashable and unhashable arguments and how many iterators they kept."""
+    print("{:<20}{:>12}{:>16}{:>16}".format("benchmark", "calls", "time (ms)", "kept"))
+    for name, func, args in (
+        ("hashable args", repeat_tuple, lambda i: ("item", "number", i)),
+        ("unhashable args", repeat_list, lambda i: ["item", "number", i]),
+    ):
+        elapsed = time_calls(func, args, number)
+        print("{:<20}{:>12}{:>16.1f}{:>16}".format(name, number, elapsed * 1e3, func.cache_info().currsize))
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
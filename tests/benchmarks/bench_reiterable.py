@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#-----------------------------------------------------------------------------------------------------------------------
+# INFO:
+#-----------------------------------------------------------------------------------------------------------------------
+
+"""
+Author: Evan Hubinger
+License: Apache 2.0
+Description: Runtime benchmark for repeatedly indexing map and zip over an iterator, either by teeing it for every access
+or by wrapping it in reiterable once.
+
+Usage: python -m tests.benchmarks.bench_reiterable [number of indices]
+"""
+
+#-----------------------------------------------------------------------------------------------------------------------
+# IMPORTS:
+#-----------------------------------------------------------------------------------------------------------------------
+
+from __future__ import print_function, absolute_import, unicode_literals, division
+
+from coconut.root import *  # NOQA
+
+import sys
+
+from coconut.__coconut__ import map, zip, tee, reiterable, _coconut_igetitem
+
+from tests.benchmarks import best_of
+
+#-----------------------------------------------------------------------------------------------------------------------
+# UTILITIES:
+#-----------------------------------------------------------------------------------------------------------------------
+
+
+def square(x):
+    """Squares x."""
+    return x * x
+
+
+def index_teed(wrap, number):
+    """Indexes wrap(get) at every index below number, where get returns a new tee of the iterator every time."""
+    iterators = [iter(range(number))]
+
+    def get():
+        iterators[0], copy = tee(iterators[0])
+        return copy
+    for i in range(number):
+        _coconut_igetitem(wrap(get), i)
+
+
+def index_reiterable(wrap, number):
+    """Indexes wrap(get) at every index below number, where get returns a single reiterable of the iterator."""
+    items = reiterable(iter(range(number)))
+    for i in range(number):
+        _coconut_igetitem(wrap(lambda: items), i)
+
+#-----------------------------------------------------------------------------------------------------------------------
+# MAIN:
+#-----------------------------------------------------------------------------------------------------------------------
+
+
+def main(number=10000):
+    """Prints the time taken by indexing map and zip over an iterator at every index with tee and with reiterable."""
+    print("{:<20}{:>12}{:>16}{:>16}".format("benchmark", "indices", "tee (ms)", "reiterable (ms)"))
+    for name, wrap in (
+        ("map", lambda get: map(square, get())),
+        ("zip", lambda get: zip(get(), get())),
+    ):
+        print("{:<20}{:>12}{:>16.1f}{:>16.1f}".format(
+            name,
+            number,
+            best_of(lambda: index_teed(wrap, number)) * 1e3,
+            best_of(lambda: index_reiterable(wrap, number)) * 1e3,
+        ))
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#-----------------------------------------------------------------------------------------------------------------------
+# INFO:
+#-----------------------------------------------------------------------------------------------------------------------
+
+"""
+Author: Evan Hubinger
+License: Apache 2.0
+Description: Throughput benchmark for passing buffers to and from parallel_map through memory-mapped files versus pickling them.
+
+Usage: python -m tests.benchmarks.bench_shared [number of buffers] [buffer size in KiB]
+"""
+
+#-----------------------------------------------------------------------------------------------------------------------
+# IMPORTS:
+#-----------------------------------------------------------------------------------------------------------------------
+
+from __future__ import print_function, absolute_import, unicode_literals, division
+
+from coconut.root import *  # NOQA
+
+import sys
+
+from coconut.__coconut__ import parallel_map
+
+from tests.benchmarks import best_of
+
+#-----------------------------------------------------------------------------------------------------------------------
+# UTILITIES:
+#-----------------------------------------------------------------------------------------------------------------------
+
+
+def first_byte(buf):
+    """Gets the first byte of buf."""
+    return buf[0]
+
+
+def echo(buf):
+    """Returns buf unchanged."""
+    return buf
+
+
+def throughput(func, buffers, shared, repeat=3):
+    """Gets the best throughput in MiB/s of mapping func over buffers with or without memory-mapped files."""
+    if not shared and isinstance(buffers[0], memoryview):
+        return "unpicklable"
+    parallel_map.configure(shared_min_size=1 if shared else None)
+    tuple(parallel_map(func, buffers[:1]))  # start up the executor outside of the timing
+    elapsed = best_of(lambda: tuple(parallel_map(func, buffers)), repeat=repeat)
+    parallel_map.configure()
+    return "{:.0f}".format(sum(memoryview(buf).nbytes for buf in buffers) / elapsed / 2**20)
+
+#-----------------------------------------------------------------------------------------------------------------------
+# MAIN:
+#-----------------------------------------------------------------------------------------------------------------------
+
+
+def main(number=16, size=4096):
+    """Prints the throughput of parallel_map over large buffers when pickling them and when using memory-mapped files."""
+    data = bytes(bytearray(range(256))) * (size * 4)  # size KiB
+    benchmarks = [
+        ("bytes in", first_byte, [data] * number),
+        ("memoryview in", first_byte, [memoryview(data)] * number),
+        ("bytes in and out", echo, [data] * number),
+        ("memoryview in and out", echo, [memoryview(data)] * number),
+    ]
+    print("{:<24}{:>10}{:>20}{:>20}".format("benchmark", "buffers", "pickled (MiB/s)", "mapped (MiB/s)"))
+    for name, func, buffers in benchmarks:
+        print("{:<24}{:>10}{:>20}{:>20}".format(
+            name,
+            number,
+            throughput(func, buffers, False),
+            throughput(func, buffers, True),
+        ))
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
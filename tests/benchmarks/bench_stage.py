@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#-----------------------------------------------------------------------------------------------------------------------
+# INFO:
+#-----------------------------------------------------------------------------------------------------------------------
+
+"""
+Author: Evan Hubinger
+License: Apache 2.0
+Description: Runtime benchmark for a read, transform, and write pipeline run serially and with concurrent_stage and parallel_stage.
+
+Usage: python -m tests.benchmarks.bench_stage [number of items] [milliseconds per stage per item]
+"""
+
+#-----------------------------------------------------------------------------------------------------------------------
+# IMPORTS:
+#-----------------------------------------------------------------------------------------------------------------------
+
+from __future__ import print_function, absolute_import, unicode_literals, division
+
+from coconut.root import *  # NOQA
+
+import sys
+import time
+import functools
+
+from coconut.__coconut__ import concurrent_stage, parallel_stage
+
+from tests.benchmarks import best_of
+
+#-----------------------------------------------------------------------------------------------------------------------
+# UTILITIES:
+#-----------------------------------------------------------------------------------------------------------------------
+
+
+def read_all(delay, xs):
+    """Simulates an IO-bound stage by sleeping for delay seconds per item."""
+    for x in xs:
+        time.sleep(delay)
+        yield x
+
+
+def transform_all(delay, xs):
+    """Simulates a CPU-bound stage by spinning for delay seconds per item."""
+    for x in xs:
+        stop = time.time() + delay
+        while time.time() < stop:
+            pass
+        yield x * 2
+
+
+def write_all(delay, xs):
+    """Simulates an IO-bound final stage by sleeping for delay seconds per item."""
+    total = 0
+    for x in xs:
+        time.sleep(delay)
+        total += x
+    return total
+
+
+def run_pipeline(items, delay, read_stage, transform_stage):
+    """Runs the read, transform, and write pipeline, wrapping its first two stages with read_stage and transform_stage."""
+    read = read_stage(functools.partial(read_all, delay))
+    transform = transform_stage(functools.partial(transform_all, delay))
+    return write_all(delay, transform(read(range(items))))
+
+#-----------------------------------------------------------------------------------------------------------------------
+# MAIN:
+#-----------------------------------------------------------------------------------------------------------------------
+
+
+def main(items=100, delay_ms=5):
+    """Prints the time taken by a three-stage pipeline run serially, with threaded stages, and with a process stage."""
+    delay = delay_ms / 1000
+    benchmarks = [
+        ("serial", lambda func: func, lambda func: func),
+        ("concurrent_stage", concurrent_stage, concurrent_stage),
+        ("parallel_stage", concurrent_stage, parallel_stage),
+    ]
+    print("{:<20}{:>12}{:>16}".format("benchmark", "items", "time (ms)"))
+    for name, read_stage, transform_stage in benchmarks:
+        elapsed = best_of(lambda: run_pipeline(items, delay, read_stage, transform_stage))
+        print("{:<20}{:>12}{:>16.1f}".format(name, items, elapsed * 1e3))
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
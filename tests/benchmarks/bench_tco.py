@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#-----------------------------------------------------------------------------------------------------------------------
+# INFO:
+#-----------------------------------------------------------------------------------------------------------------------
+
+"""
+Author: Evan Hubinger
+License: Apache 2.0
+Description: Runtime benchmark for tail call optimization and pattern-matching function dispatch.
+
+Usage: python -m tests.benchmarks.bench_tco [recursion depth] [number of patterns]
+"""
+
+#-----------------------------------------------------------------------------------------------------------------------
+# IMPORTS:
+#-----------------------------------------------------------------------------------------------------------------------
+
+from __future__ import print_function, absolute_import, unicode_literals, division
+
+from coconut.root import *  # NOQA
+
+import sys
+
+from coconut.convenience import parse, setup
+
+from tests.benchmarks import best_of
+
+#-----------------------------------------------------------------------------------------------------------------------
+# UTILITIES:
+#-----------------------------------------------------------------------------------------------------------------------
+
+
+def gen_source(num_patterns):
+    """Generates Coconut source for the benchmarked functions."""
+    lines = [
+        "def is_even(n) =",
+        "    if not n:",
+        "        return True",
+        "    is_odd(n-1)",
+        "def is_odd(n) =",
+        "    if not n:",
+        "        return False",
+        "    is_even(n-1)",
+        "",
+        "def is_even_(0) = True",
+        "@addpattern(is_even_)",
+        "def is_even_(n) = is_odd_(n-1)",
+        "def is_odd_(0) = False",
+        "@addpattern(is_odd_)",
+        "def is_odd_(n) = is_even_(n-1)",
+        "",
+        "def chain(0) = 0",
+    ]
+    for i in range(1, num_patterns):
+        lines.append("@addpattern(chain)")
+        lines.append("def chain(" + str(i) + ") = " + str(i))
+    return "\n".join(lines) + "\n"
+
+#-----------------------------------------------------------------------------------------------------------------------
+# MAIN:
+#-----------------------------------------------------------------------------------------------------------------------
+
+
+def main(depth=10000, num_patterns=20):
+    """Prints the time taken by deep mutual recursion and by calls that match the last case of an addpattern chain."""
+    setup()
+    namespace = {}
+    exec(parse(gen_source(num_patterns)), namespace)
+    benchmarks = [
+        ("mutual recursion", "is_even(" + str(depth) + ")", 10),
+        ("addpattern recursion", "is_even_(" + str(depth) + ")", 10),
+        ("addpattern chain", "chain(" + str(num_patterns - 1) + ")", depth),
+    ]
+    print("{:<24}{:>12}{:>16}".format("benchmark", "calls", "time (ms)"))
+    for name, stmt, number in benchmarks:
+        print("{:<24}{:>12}{:>16.1f}".format(name, number, best_of(stmt, number, repeat=5, namespace=namespace) * 1e3))
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -25,6 +25,7 @@ import subprocess
 import shutil
 import unittest
 import platform
+import io
 from contextlib import contextmanager
 
 #-----------------------------------------------------------------------------------------------------------------------
@@ -86,6 +87,25 @@ def comp(path=None, folder=None, file=None, args=[]):
     call_coconut([source, compdest] + args)
 
 
+def comp_chunked(path, target=None, chunk_lines=40):
+    """Compiles the file at path serially and in chunks of chunk_lines lines across a process pool, returning both results."""
+    from concurrent.futures import ProcessPoolExecutor
+    import coconut.compiler.compiler
+    from coconut.compiler import Compiler
+    from coconut.command.util import multiprocess_wrapper
+    with io.open(path, "r", encoding="utf-8") as opened:
+        code = opened.read()
+    compiler = Compiler(target)
+    serial = compiler.parse_module(code)
+    old_chunk_lines, coconut.compiler.compiler.parse_chunk_lines = coconut.compiler.compiler.parse_chunk_lines, chunk_lines
+    try:
+        with ProcessPoolExecutor(2) as executor:
+            chunked = compiler.parse_module(code, chunk_map=lambda method, *iterables: executor.map(multiprocess_wrapper(compiler, method), *iterables))
+    finally:
+        coconut.compiler.compiler.parse_chunk_lines = old_chunk_lines
+    return serial, chunked
+
+
 @contextmanager
 def remove_when_done(directory):
     """Removes a directory when done."""
@@ -245,6 +265,14 @@ class TestCompilation(unittest.TestCase):
         def test_jobs_zero(self):
             run(["--jobs", "0"])
 
+        def test_chunks(self):
+            folders = [("agnostic", None), ("python2" if PY2 else "python3", "2" if PY2 else "3")]
+            for folder, target in folders:
+                folder = os.path.join(src, "cocotest", folder)
+                for name in os.listdir(folder):
+                    serial, chunked = comp_chunked(os.path.join(folder, name), target)
+                    self.assertEqual(serial, chunked, name + " compiled in chunks differs from compiling it serially")
+
     def test_run(self):
         run(comp_run=True)
 